@@ -10,6 +10,8 @@ __name__ = "metric_visualizer"
 
 from .metric_visualizer import MetricVisualizer
 from .colalab import reformat_tikz_format_for_colalab
+from .stat_registry import register_stat
+from .plot_spec import PlotSpec
 
 from update_checker import UpdateChecker
 
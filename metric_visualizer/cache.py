@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+# file: cache.py
+# time: 10:12 2026/10/19
+# author: yangheng <hy345@exeter.ac.uk>
+# github: https://github.com/yangheng95
+# huggingface: https://huggingface.co/yangheng
+# google scholar: https://scholar.google.com/citations?user=NPq5a_0AAAAJ&hl=en
+# Copyright (C) 2021. All Rights Reserved.
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class StatTestCache:
+    """A bounded LRU cache of statistical test results.
+
+    Results are keyed by the test name, its parameters and a hash of every
+    sample's sorted values, so the same test on the same data is only run
+    once, whichever MetricVisualizer (or trial name) the data comes from.
+    """
+
+    def __init__(self, maxsize=65536):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(test, samples, **params):
+        """Hash a test name, its parameters and its samples.
+
+        :param test: the name of the test, such as ranksums, a12, etc.
+        :param samples: the samples the test runs on, order matters
+        :param params: the parameters changing the test result
+
+        :return: the hex digest of the key
+        """
+        h = hashlib.sha1(test.encode("utf8"))
+        h.update(repr(sorted(params.items())).encode("utf8"))
+        for sample in samples:
+            sample = np.sort(np.asarray(sample, dtype=float), axis=None)
+            h.update(str(len(sample)).encode("utf8"))
+            h.update(sample.tobytes())
+        return h.hexdigest()
+
+    def get_or_compute(self, test, samples, func, **params):
+        """Return the cached result of a test, running func() on a miss.
+
+        :param test: the name of the test, such as ranksums, a12, etc.
+        :param samples: the samples the test runs on, order matters
+        :param func: a callable without arguments computing the result
+        :param params: the parameters changing the test result
+
+        :return: the test result
+        """
+        key = self.key(test, samples, **params)
+        with self._lock:
+            if key in self._results:
+                self.hits += 1
+                self._results.move_to_end(key)
+                return self._results[key]
+            self.misses += 1
+        result = func()
+        with self._lock:
+            self._results[key] = result
+            self._results.move_to_end(key)
+            while len(self._results) > self.maxsize:
+                self._results.popitem(last=False)
+        return result
+
+    def info(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._results),
+            "maxsize": self.maxsize,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+            self.hits = self.misses = 0
+
+    def save(self, path):
+        """Save the cached results to a file
+
+        :param path: the path of the cache file
+        """
+        with self._lock:
+            results = OrderedDict(self._results)
+        with open(path, mode="wb") as fout:
+            pickle.dump(results, fout)
+
+    def load(self, path):
+        """Merge the results of a cache file into this cache, if it exists
+
+        :param path: the path of the cache file
+        """
+        if not os.path.exists(path):
+            return
+        with open(path, mode="rb") as fin:
+            results = pickle.load(fin)
+        with self._lock:
+            for key, result in results.items():
+                self._results.setdefault(key, result)
+            while len(self._results) > self.maxsize:
+                self._results.popitem(last=False)
+
+
+class RenderCache:
+    """An on-disk cache of rendered plot files (png, svg, tex, etc.).
+
+    Files are addressed by a hash of everything the plot depends on (see key()), so a
+    plot of unchanged data is copied (or hard-linked) from the cache instead of being
+    drawn and saved again. The index (index.json in the cache directory) keeps the size
+    and last use of every file, the least recently used files are evicted when the cache
+    grows over max_size bytes. fetch() and store() only change the index in memory, call
+    flush() to write it once a batch of plots is done.
+    """
+
+    INDEX = "index.json"
+
+    def __init__(self, cache_dir=None, max_size=1 << 30, link=False):
+        """
+        :param cache_dir: the directory of the cached files, ~/.cache/metric_visualizer/renders by default
+        :param max_size: the maximum total size of the cached files, in bytes
+        :param link: hard-link the cached files to the save paths instead of copying them,
+            falling back to a copy where links are not supported
+        """
+        if cache_dir is None:
+            cache_dir = os.path.join(
+                os.path.expanduser("~"), ".cache", "metric_visualizer", "renders"
+            )
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.link = link
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._dirty = False
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._index = self._load_index()
+
+    @staticmethod
+    def key(*parts):
+        """Hash the parts of a plot key, such as its data digest, kwargs, engine and library versions.
+
+        :return: the hex digest of the key
+        """
+        h = hashlib.sha1()
+        for part in parts:
+            if not isinstance(part, bytes):
+                part = str(part).encode("utf8")
+            h.update(str(len(part)).encode("utf8"))
+            h.update(part)
+        return h.hexdigest()
+
+    def _load_index(self):
+        path = os.path.join(self.cache_dir, self.INDEX)
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, mode="r", encoding="utf8") as fin:
+                return json.load(fin)
+        except (OSError, ValueError):
+            # a damaged index only loses the cached files
+            return {}
+
+    def flush(self):
+        """Write the index, if it changed since it was last written."""
+        with self._lock:
+            if not self._dirty:
+                return
+            index = json.dumps(self._index)
+            self._dirty = False
+        path = os.path.join(self.cache_dir, self.INDEX)
+        tmp = "{}.{}.tmp".format(path, os.getpid())
+        with open(tmp, mode="w", encoding="utf8") as fout:
+            fout.write(index)
+        os.replace(tmp, path)
+
+    def fetch(self, key, save_path):
+        """Place the cached file of a key at save_path, if any
+
+        :param key: the key of the plot
+        :param save_path: the path the plot is to be saved to
+
+        :return: whether the key was cached
+        """
+        with self._lock:
+            entry = self._index.get(key)
+            cached = (
+                os.path.join(self.cache_dir, entry["file"])
+                if entry is not None
+                else None
+            )
+            if cached is None or not os.path.exists(cached):
+                if self._index.pop(key, None) is not None:
+                    self._dirty = True
+                self.misses += 1
+                return False
+            entry["last_used"] = time.time()
+            self._dirty = True
+            self.hits += 1
+        if os.path.dirname(save_path):
+            os.makedirs(os.path.dirname(save_path), exist_ok=True)
+        self.release(save_path)
+        if self.link:
+            try:
+                if os.path.lexists(save_path):
+                    os.remove(save_path)
+                os.link(cached, save_path)
+            except OSError:
+                shutil.copyfile(cached, save_path)
+        else:
+            shutil.copyfile(cached, save_path)
+        return True
+
+    def release(self, save_path):
+        """Unlink save_path if it is a hard link, so it is not overwritten in place with a cached file."""
+        if os.path.lexists(save_path) and os.stat(save_path).st_nlink > 1:
+            os.remove(save_path)
+
+    def store(self, key, path):
+        """Copy a rendered file into the cache, evicting the least recently used files over max_size
+
+        :param key: the key of the plot
+        :param path: the rendered file
+        """
+        if not os.path.exists(path):
+            return
+        name = key + os.path.splitext(path)[1]
+        cached = os.path.join(self.cache_dir, name)
+        tmp = "{}.{}.tmp".format(cached, os.getpid())
+        shutil.copyfile(path, tmp)
+        os.replace(tmp, cached)
+        with self._lock:
+            self._index[key] = {
+                "file": name,
+                "size": os.path.getsize(cached),
+                "last_used": time.time(),
+            }
+            self._dirty = True
+            size = sum(entry["size"] for entry in self._index.values())
+            for old_key in sorted(
+                self._index, key=lambda k: self._index[k]["last_used"]
+            ):
+                if size <= self.max_size:
+                    break
+                entry = self._index.pop(old_key)
+                size -= entry["size"]
+                try:
+                    os.remove(os.path.join(self.cache_dir, entry["file"]))
+                except OSError:
+                    pass
+
+    def info(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "files": len(self._index),
+                "size": sum(entry["size"] for entry in self._index.values()),
+                "max_size": self.max_size,
+            }
+
+    def clear(self):
+        with self._lock:
+            for entry in self._index.values():
+                try:
+                    os.remove(os.path.join(self.cache_dir, entry["file"]))
+                except OSError:
+                    pass
+            self._index.clear()
+            self._dirty = True
+            self.hits = self.misses = 0
+        self.flush()
+
+
+# shared by the Scott-Knott, rank-sum and A12 tests
+stat_test_cache = StatTestCache()
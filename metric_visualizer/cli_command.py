@@ -12,17 +12,23 @@ import click
 import findfile
 
 from metric_visualizer.metric_visualizer import MetricVisualizer
-import multiprocessing
 
 
 @click.command()
 @click.argument("mv")
+@click.option("--n_jobs", "-j", default=-1, help="The number of rendering processes")
+@click.option(
+    "--cache_dir",
+    "-c",
+    default=None,
+    help="The render cache directory, the plots of unchanged data are copied from it",
+)
 # @click.option('--save', '-s', default=True, help='Save the figure')
-def instant_visualize(mv=None, **kwargs):
+def instant_visualize(mv=None, n_jobs=-1, cache_dir=None, **kwargs):
     print("Metric Visualizer file: ", mv)
     MV = MetricVisualizer.load(mv)
 
-    MV.summary(save_path=os.getcwd(), filename="file_name", no_print=False)
+    MV.summary(save_path=os.path.join(os.getcwd(), MV.name), no_print=False)
 
     print("Rank test results by trial: ")
     print(MV._rank_test_by_trial(**kwargs))
@@ -30,52 +36,40 @@ def instant_visualize(mv=None, **kwargs):
     print("Rank test results by_metric: ")
     print(MV._rank_test_by_metric(**kwargs))
 
-    # MV.traj_plot_by_trial(xlabel='', xrotation=30, minorticks_on=True)
-    # MV.violin_plot_by_trial()
-    # MV.box_plot_by_trial()
-    # MV.box_plot_by_trial()
-    # MV.avg_bar_plot_by_trial()
-    # MV.sum_bar_plot_by_trial()
-
-    # MV.traj_plot_by_metric(xlabel='', xrotation=30, minorticks_on=True)
-    # MV.violin_plot_by_metric()
-    # MV.box_plot_by_metric()
-    # MV.box_plot_by_metric()
-    # MV.avg_bar_plot_by_metric()
-    # MV.sum_bar_plot_by_metric()
-
-    # MV.scott_knott_plot(plot_type='box', minorticks_on=False)
-    # MV.scott_knott_plot(plot_type='violin', minorticks_on=False)
-
-    pool = multiprocessing.Pool(os.cpu_count())
-    pool.apply_async(
-        MV.traj_plot_by_trial, args=dict(xlabel="", xrotation=30, minorticks_on=True)
-    )
-    pool.apply_async(MV.violin_plot_by_trial)
-    pool.apply_async(MV.box_plot_by_trial)
-    pool.apply_async(MV.box_plot_by_trial)
-    pool.apply_async(MV.avg_bar_plot_by_trial)
-    pool.apply_async(MV.sum_bar_plot_by_trial)
-
-    pool.apply_async(
-        MV.traj_plot_by_metric, args=dict(xlabel="", xrotation=30, minorticks_on=True)
-    )
-    pool.apply_async(MV.violin_plot_by_metric)
-    pool.apply_async(MV.box_plot_by_metric)
-    pool.apply_async(MV.box_plot_by_metric)
-    pool.apply_async(MV.avg_bar_plot_by_metric)
-    pool.apply_async(MV.sum_bar_plot_by_metric)
-
-    pool.apply_async(
-        MV.scott_knott_plot, args=dict(plot_type="box", minorticks_on=False)
-    )
-    pool.apply_async(
-        MV.scott_knott_plot, args=dict(plot_type="violin", minorticks_on=False)
-    )
-    pool.close()
-    pool.join()
-
-    pool.terminate()
+    plots = []
+    for by in ["trial", "metric"]:
+        plots += [
+            dict(
+                kind="trajectory",
+                by=by,
+                kwargs=dict(xlabel="", xrotation=30, minor_ticks=True),
+            ),
+            dict(kind="violin", by=by),
+            dict(kind="box", by=by),
+            dict(kind="bar", by=by),
+        ]
+    plots += [
+        dict(
+            kind="sk_rank",
+            save_path="{}.sk_rank_plot_box.png".format(MV.name),
+            kwargs=dict(plot_type="box", minor_ticks=False),
+        ),
+        dict(
+            kind="sk_rank",
+            save_path="{}.sk_rank_plot_violin.png".format(MV.name),
+            kwargs=dict(plot_type="violin", minor_ticks=False),
+        ),
+    ]
+
+    for result in MV.render_all(plots, n_jobs=n_jobs, cache=cache_dir):
+        if result["error"]:
+            print(
+                "Failed to render {}:\n{}".format(result["save_path"], result["error"])
+            )
+        elif result["cached"]:
+            print("Copied {} from the render cache".format(result["save_path"]))
+        else:
+            print("Rendered {} in {:.2f}s".format(result["save_path"], result["time"]))
 
 
 if __name__ == "__main__":
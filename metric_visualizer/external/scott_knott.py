@@ -1,8 +1,9 @@
-from copy import deepcopy as kopy
 import random
 import natsort
+import numpy as np
 from termcolor import colored
 from metric_visualizer import MetricVisualizer
+from metric_visualizer.cache import stat_test_cache
 
 """
 Scott-Knot test + non parametric effect size + significance tests.
@@ -64,7 +65,8 @@ class o:
 
 class THE:
     cliffs = o(dull=[0.147, 0.33, 0.474][0])  # small  # medium  # large
-    bs = o(conf=0.05, b=500)
+    bs = o(conf=0.05, b=500, seed=0)
+    sk = o(cells=2**22)  # max size of the count / resample matrices
     mine = o(private="_")
     char = o(skip="?")
     rx = o(show="%4s %10s %s")
@@ -96,93 +98,93 @@ def cliffsDeltaSlow(lst1, lst2, dull=THE.cliffs.dull):
 
 
 def cliffsDelta(lst1, lst2, dull=THE.cliffs.dull):
-    "By pre-soring the lists, this cliffsDelta runs in NlogN time"
-
-    def runs(lst):
-        for j, two in enumerate(lst):
-            if j == 0:
-                one, i = two, 0
-            if one != two:
-                yield j - i, one
-                i = j
-            one = two
-        yield j - i + 1, two
-
-    # ---------------------
-    m, n = len(lst1), len(lst2)
-    lst2 = sorted(lst2)
-    j = more = less = 0
-    for repeats, x in runs(sorted(lst1)):
-        while j <= (n - 1) and lst2[j] < x:
-            j += 1
-        more += j * repeats
-        while j <= (n - 1) and lst2[j] == x:
-            j += 1
-        less += (n - j) * repeats
-    d = (more - less) / (m * n)
-    return abs(d) <= dull
-
-
-def bootstrap(y0, z0, conf=THE.bs.conf, b=THE.bs.b):
+    "Returns true if there are no more than 'dull' difference. NlogN time."
+    return abs(cliffsDeltaValue(lst1, lst2)) <= dull
+
+
+def cliffsDeltaValue(lst1, lst2):
+    """Cliff's delta of lst1 against lst2, in [-1, 1].
+    Counts, for every x in lst1, the values of the sorted lst2 below and above
+    x with np.searchsorted, so it runs in NlogN time."""
+    one = np.asarray(lst1, dtype=float)
+    two = np.sort(np.asarray(lst2, dtype=float))
+    more = np.searchsorted(two, one, side="left").sum()
+    less = (len(two) - np.searchsorted(two, one, side="right")).sum()
+    return float(more - less) / (len(one) * len(two))
+
+
+def cliffsDeltaMatrix(lsts):
+    """Cliff's delta of every pair of lists at once: d[i, j] is the delta of
+    lsts[i] against lsts[j]. Each list is sorted once and searched with all
+    the values of every list in one np.searchsorted call. The delta of an
+    empty list, or against one, is NaN."""
+    sizes = np.array([len(lst) for lst in lsts], dtype=int)
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    # reduceat needs the starts of the non-empty lists only
+    filled = sizes > 0
+    values = np.concatenate([np.asarray(lst, dtype=float) for lst in lsts] + [[]])
+    d = np.full((len(lsts), len(lsts)), np.nan)
+    for j, lst in enumerate(lsts):
+        if not len(lst):
+            continue
+        two = np.sort(np.asarray(lst, dtype=float))
+        more = np.searchsorted(two, values, side="left")
+        less = len(two) - np.searchsorted(two, values, side="right")
+        d[filled, j] = np.add.reduceat(more - less, starts[filled]) / (
+            sizes[filled] * len(two)
+        )
+    return d
+
+
+def bootstrap(y0, z0, conf=THE.bs.conf, b=THE.bs.b, seed=THE.bs.seed):
     """
     two  lists y0,z0 are the same if the same patterns can be seen in all of them, as well
     as in 100s to 1000s  sub-samples from each.
     From p220 to 223 of the Efron text  'introduction to the boostrap'.
     Typically, conf=0.05 and b is 100s to 1000s.
+    All b resamples are drawn as one (b, n) index matrix per list (in chunks of
+    at most THE.sk.cells values) from a Generator built from `seed`, so the same
+    two lists and seed always give the same answer.
     """
 
-    class Sum:
-        def __init__(i, some=[]):
-            i.sum = i.n = i.mu = 0
-            i.all = []
-            for one in some:
-                i.put(one)
-
-        def put(i, x):
-            i.all.append(x)
-            i.sum += x
-            i.n += 1
-            i.mu = float(i.sum) / i.n
-
-        def __add__(i1, i2):
-            return Sum(i1.all + i2.all)
-
     def testStatistic(y, z):
-        tmp1 = tmp2 = 0
-        for y1 in y.all:
-            tmp1 += (y1 - y.mu) ** 2
-        for z1 in z.all:
-            tmp2 += (z1 - z.mu) ** 2
-        s1 = float(tmp1) / (y.n - 1)
-        s2 = float(tmp2) / (z.n - 1)
-        delta = z.mu - y.mu
-        if s1 + s2:
-            delta = delta / ((s1 / y.n + s2 / z.n) ** 0.5)
-        return delta
-
-    def one(lst):
-        return lst[int(any(len(lst)))]
-
-    def any(n):
-        return random.uniform(0, n)
-
-    y, z = Sum(y0), Sum(z0)
-    x = y + z
+        "t-statistic of every row of y against the same row of z"
+        ny, nz = y.shape[-1], z.shape[-1]
+        s1 = y.var(axis=-1, ddof=1) if ny > 1 else np.zeros(y.shape[:-1])
+        s2 = z.var(axis=-1, ddof=1) if nz > 1 else np.zeros(z.shape[:-1])
+        delta = z.mean(axis=-1) - y.mean(axis=-1)
+        scale = np.sqrt(s1 / ny + s2 / nz)
+        return np.where(scale > 0, delta / np.where(scale > 0, scale, 1), delta)
+
+    rng = np.random.default_rng(seed)
+    y, z = np.asarray(y0, dtype=float), np.asarray(z0, dtype=float)
+    x = np.concatenate([y, z])
     baseline = testStatistic(y, z)
-    yhat = [y1 - y.mu + x.mu for y1 in y.all]
-    zhat = [z1 - z.mu + x.mu for z1 in z.all]
+    yhat = y - y.mean() + x.mean()
+    zhat = z - z.mean() + x.mean()
     bigger = 0
-    for i in range(b):
-        if (
-            testStatistic(
-                Sum([one(yhat) for _ in yhat]), Sum([one(zhat) for _ in zhat])
-            )
-            > baseline
-        ):
-            bigger += 1
+    step = max(1, THE.sk.cells // len(x))
+    for i in range(0, b, step):
+        rows = min(step, b - i)
+        some_y = yhat[rng.integers(0, len(yhat), size=(rows, len(yhat)))]
+        some_z = zhat[rng.integers(0, len(zhat), size=(rows, len(zhat)))]
+        bigger += int(np.count_nonzero(testStatistic(some_y, some_z) > baseline))
     return bigger / b >= conf
 
 
+def sameTreatments(lst1, lst2, seed=THE.bs.seed):
+    "cliffsDelta and bootstrap both say same; cached by content in stat_test_cache"
+    return stat_test_cache.get_or_compute(
+        "scott-knott",
+        (lst1, lst2),
+        lambda: cliffsDelta(lst1, lst2) and bootstrap(lst1, lst2, seed=seed),
+        dull=THE.cliffs.dull,
+        conf=THE.bs.conf,
+        b=THE.bs.b,
+        seed=seed,
+    )
+
+
 # -------------------------------------------------------
 # misc functions
 def same(x):
@@ -240,7 +242,7 @@ class Rx(Mine):
         return i.med < j.med
 
     def __eq__(i, j):
-        return cliffsDelta(i.vals, j.vals) and bootstrap(i.vals, j.vals)
+        return sameTreatments(i.vals, j.vals)
 
     def __repr__(i):
         return "%4s %10s %s" % (i.rank, i.rx, i.tiles())
@@ -254,8 +256,12 @@ class Rx(Mine):
 
     @staticmethod
     def data(**d):
-        "convert dictionary to list of treatments"
-        ranks = Rx.sk(natsort.natsorted([Rx(k, v) for k, v in d.items()]))
+        """convert dictionary to list of treatments.
+        Also appends [name, rank] pairs to Rx.list_algorithm_rank, which is shared
+        by all callers; use scott_knott_rank() to get the ranks back instead."""
+        ranks = Rx.sk(
+            natsort.natsorted([Rx(k, v) for k, v in d.items()], key=lambda rx: rx.rx)
+        )
         for rx in sorted(ranks):
             Rx.list_algorithm_rank.append([rx.rx, rx.rank])
         return ranks
@@ -278,37 +284,87 @@ class Rx(Mine):
             print(THE.rx.show % (rx.rank, rx.rx, rx.tiles()))
 
     @staticmethod
-    def sk(rxs):
-        "sort treatments and rank them"
-
-        def divide(lo, hi, b4, rank):
-            cut = left = right = None
+    def sk(rxs, seed=THE.bs.seed):
+        """sort treatments and rank them.
+        All values are sorted once, tagged with the position of their treatment.
+        A contiguous run of treatments is then a label range, so the counts of
+        every split come from a cumulative sum over the treatment sizes and the
+        medians of both halves from cumulative label counts over the sorted
+        values, evaluated for all split points of a run at once.
+        `seed` is handed to every bootstrap test, so the ranks are reproducible."""
+
+        def medians(vals, labs, cuts, k_left, k_right):
+            "positions of the left/right medians for every cut of one run"
+            left = np.empty(len(cuts), dtype=int)
+            right = np.empty(len(cuts), dtype=int)
+            step = max(1, THE.sk.cells // len(vals))
+            seen = np.arange(1, len(vals) + 1)[:, None]
+            for c in range(0, len(cuts), step):
+                below = np.cumsum(labs[:, None] < cuts[None, c : c + step], axis=0)
+                left[c : c + step] = np.argmax(below > k_left[c : c + step], axis=0)
+                right[c : c + step] = np.argmax(
+                    seen - below > k_right[c : c + step], axis=0
+                )
+            return vals[left], vals[right]
+
+        def divide(lo, hi, vals, labs, rank):
+            cut = None
             best = 0
-            for j in range(lo + 1, hi):
-                left0 = Rx.sum(rxs[lo:j])
-                right0 = Rx.sum(rxs[j:hi])
-                now = left0.xpect(right0, b4)
-                if now > best:
-                    if left0 != right0:
-                        best, cut, left, right = now, j, kopy(left0), kopy(right0)
+            if hi - lo > 1:
+                cuts = np.arange(lo + 1, hi)
+                n_left = offsets[cuts] - offsets[lo]
+                n_right = offsets[hi] - offsets[cuts]
+                n = offsets[hi] - offsets[lo]
+                med = vals[n // 2]
+                left_med, right_med = medians(
+                    vals, labs, cuts, n_left // 2, n_right // 2
+                )
+                xpect = (
+                    n_left / n * (med - left_med) ** 2
+                    + n_right / n * (right_med - med) ** 2
+                )
+                for j, now in zip(cuts, xpect.tolist()):
+                    if now > best:
+                        left = labs < j
+                        if not sameTreatments(vals[left], vals[~left], seed):
+                            best, cut = now, j
             if cut:
-                rank = divide(lo, cut, left, rank) + 1
-                rank = divide(cut, hi, right, rank)
+                left = labs < cut
+                rank = divide(lo, cut, vals[left], labs[left], rank) + 1
+                rank = divide(cut, hi, vals[~left], labs[~left], rank)
             else:
                 for rx in rxs[lo:hi]:
                     rx.rank = rank
             return rank
 
         # -- sk main
-        # print('<info> before sorting')
-        # print(rxs)
         rxs = sorted(rxs)
-        # print('<info> after sorting')
-        # print(rxs)
-        divide(0, len(rxs), Rx.sum(rxs), 1)
+        sizes = [rx.n for rx in rxs]
+        offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(int)
+        vals = np.array([val for rx in rxs for val in rx.vals])
+        labs = np.repeat(np.arange(len(rxs)), sizes)
+        order = np.argsort(vals, kind="stable")
+        divide(0, len(rxs), vals[order], labs[order], 1)
         return rxs
 
 
+def scott_knott_rank(groups, seed=THE.bs.seed):
+    """Scott-Knott ranks of a {treatment: vals} dict, as {treatment: rank}.
+    Unlike Rx.data, nothing is kept in class attributes, so it is safe to call
+    from several threads or processes at once."""
+    rxs = Rx.sk(
+        natsort.natsorted([Rx(k, v) for k, v in groups.items()], key=lambda rx: rx.rx),
+        seed,
+    )
+    return {rx.rx: rx.rank for rx in sorted(rxs)}
+
+
+def rankJob(job):
+    "rank one (name, {treatment: vals}, seed) job; picklable for process pools"
+    name, groups, seed = job
+    return name, scott_knott_rank(groups, seed)
+
+
 # -------------------------------------------------------
 
 
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+# file: live.py
+# time: 16:20 2026/10/19
+# author: yangheng <hy345@exeter.ac.uk>
+# github: https://github.com/yangheng95
+# huggingface: https://huggingface.co/yangheng
+# google scholar: https://scholar.google.com/citations?user=NPq5a_0AAAAJ&hl=en
+# Copyright (C) 2021. All Rights Reserved.
+import datetime
+import sys
+import threading
+
+import numpy as np
+from colorama import Cursor, Fore, Style
+from colorama.ansi import clear_line
+
+SPARKS = "▁▂▃▄▅▆▇█"
+
+
+def sparkline(values):
+    """Draw values as a line of block characters, NaN as a space."""
+    values = np.asarray(values, dtype=float)
+    finite = values[np.isfinite(values)]
+    if not len(finite):
+        return " " * len(values)
+    low, high = finite.min(), finite.max()
+    scale = (len(SPARKS) - 1) / (high - low) if high > low else 0
+    return "".join(
+        SPARKS[int(round((x - low) * scale))] if np.isfinite(x) else " " for x in values
+    )
+
+
+class LiveDashboard:
+    """A terminal view of the mean/std/count and recent trend of every (metric, trial) cell.
+
+    A background thread redraws the view in place with ANSI escape codes, at most
+    refresh_hz times per second and only after new values were logged, so any number
+    of log_metric calls between two redraws costs a single redraw. The statistics come
+    from the incremental RunningStats of the visualizer, only the values logged since
+    the last redraw are visited.
+    """
+
+    def __init__(self, mv, refresh_hz=2, metrics=None, trend_length=20, stream=None):
+        """
+        :param mv: the MetricVisualizer to show
+        :param refresh_hz: the maximum number of redraws per second
+        :param metrics: the names of the metrics to show, all of them by default
+        :param trend_length: the number of recent values drawn in the trend sparkline
+        :param stream: the stream to draw to, sys.stdout by default
+        """
+        self.mv = mv
+        self.refresh_hz = refresh_hz
+        self.metrics = metrics
+        self.trend_length = trend_length
+        self.stream = stream if stream is not None else sys.stdout
+        self.redraws = 0
+        self._lines = 0
+        self._changed = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def notify(self):
+        """Mark the data as changed, the view is redrawn at the next refresh."""
+        self._changed.set()
+
+    def start(self):
+        if self._thread is None:
+            self._stopped.clear()
+            self._changed.set()
+            self._thread = threading.Thread(
+                target=self._run, name="metric-visualizer-live", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the background thread, after drawing the latest data."""
+        if self._thread is not None:
+            self._stopped.set()
+            self._changed.set()
+            self._thread.join()
+            self._thread = None
+            self.draw()
+        if getattr(self.mv, "_live", None) is self:
+            self.mv._live = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._changed.wait()
+            if self._stopped.is_set():
+                break
+            self._changed.clear()
+            try:
+                self.draw()
+            except RuntimeError:
+                # the metric dict changed size while being read, retry at the next refresh
+                self._changed.set()
+            # throttle, the notifications until the next refresh are coalesced
+            self._stopped.wait(1 / self.refresh_hz)
+
+    def render(self):
+        """Render the view as a list of lines."""
+        header = ["Metric", "Trial", "Mean", "Std", "Count", "Trend"]
+        rows = []
+        for metric_name, trial_data in list(self.mv.metrics.items()):
+            if self.metrics is not None and metric_name not in self.metrics:
+                continue
+            for trial_name, values in list(trial_data.items()):
+                stats = self.mv._running_stats(metric_name, trial_name)
+                rows.append(
+                    [
+                        str(metric_name),
+                        str(trial_name),
+                        "{:.4g}".format(stats.mean) if stats.count else "-",
+                        "{:.4g}".format(stats.std) if stats.count > 1 else "-",
+                        str(stats.count),
+                        sparkline(values.data[-self.trend_length :]),
+                    ]
+                )
+        widths = [
+            max([len(header[i])] + [len(row[i]) for row in rows])
+            for i in range(len(header))
+        ]
+
+        def _line(cells):
+            return "  ".join(cell.ljust(w) for cell, w in zip(cells, widths))
+
+        lines = [
+            Style.BRIGHT
+            + "{} (live, {})".format(
+                self.mv.name, datetime.datetime.now().strftime("%H:%M:%S")
+            )
+            + Style.RESET_ALL,
+            Fore.CYAN + _line(header) + Style.RESET_ALL,
+        ]
+        for i, row in enumerate(rows):
+            if i and row[0] == rows[i - 1][0]:
+                row = [""] + row[1:]
+            lines.append(_line(row))
+        return lines
+
+    def draw(self):
+        """Redraw the view in place of the previous one."""
+        lines = self.render()
+        tty = hasattr(self.stream, "isatty") and self.stream.isatty()
+        out = []
+        if tty and self._lines:
+            out.append(Cursor.UP(self._lines) + "\r")
+        for line in lines:
+            out.append((clear_line() if tty else "") + line + "\n")
+        if tty:
+            # clear the remaining lines of a longer previous view
+            for _ in range(self._lines - len(lines)):
+                out.append(clear_line() + "\n")
+            if self._lines > len(lines):
+                out.append(Cursor.UP(self._lines - len(lines)))
+        self.stream.write("".join(out))
+        self.stream.flush()
+        self._lines = len(lines)
+        self.redraws += 1
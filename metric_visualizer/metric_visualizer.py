@@ -7,12 +7,21 @@
 # google scholar: https://scholar.google.com/citations?user=NPq5a_0AAAAJ&hl=en
 # Copyright (C) 2021. All Rights Reserved.
 
+import csv
 import datetime
+import gzip
+import hashlib
+import io
+import itertools
 import json
+import multiprocessing
 import os
 import pickle
-import random
+import threading
+import time
+import traceback
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 import findfile
 import matplotlib
@@ -26,7 +35,18 @@ import colorama
 
 from metric_visualizer import __version__ as version
 from metric_visualizer import __name__ as pkg_name
-from metric_visualizer.utils import MetricList
+from metric_visualizer.cache import RenderCache, stat_test_cache
+from metric_visualizer.live import LiveDashboard
+from metric_visualizer.plot_spec import PlotSpec, build_plot_spec, draw_plot_spec
+from metric_visualizer.utils import (
+    MetricList,
+    ReservoirMetricList,
+    RunningStats,
+    StreamingIQR,
+    grid_lines,
+    segmented_percentile,
+)
+from metric_visualizer.stat_registry import cell_segments, compute_stat, format_stat
 
 colorama.init()
 
@@ -91,7 +111,32 @@ class MetricVisualizer:
 
     HATCHES = ["/", "\\", "|", "-", "+", "x", "o", "O", ".", "*"]
 
-    def __init__(self, name, *, metric_dict=None, **kwargs):
+    # the number of (method, stat, kwargs) tables kept by _get_processed_table_data
+    PROCESSED_TABLES_MAXSIZE = 8
+
+    # guards the running stats, which the live dashboard updates from its thread
+    _running_stats_lock = threading.Lock()
+
+    def __init__(
+        self,
+        name,
+        *,
+        metric_dict=None,
+        reservoir_size=None,
+        stratified=False,
+        sketch_quantiles=False,
+        **kwargs,
+    ):
+        """
+        :param name: the name of the metric visualizer
+        :param metric_dict: the initial {metric: {trial: values}} data
+        :param reservoir_size: keep at most this many values per cell (see ReservoirMetricList),
+            with exact avg/std/min/max/count over all logged values, or None to keep every value.
+            With 0, only these aggregates and the sketched quartiles are kept.
+        :param stratified: sample the kept values evenly over time instead of at random
+        :param sketch_quantiles: sketch the quartiles of the sampled cells over all logged values,
+            for the box plots, always on with reservoir_size=0
+        """
         self.trial_id = 0
         self.name = name
         self.version = version
@@ -120,10 +165,21 @@ class MetricVisualizer:
 
             self.metrics = metric_dict
 
+        self.reservoir_size = reservoir_size
+        self.stratified = stratified
+        self.sketch_quantiles = sketch_quantiles
+
+        # bumped by every change of the metric dict, see stats_table()
+        self._version = 0
+
         self.trial2unit = {}
+        self.running_stats = {}
+        self.outlier_sketches = {}
+        self.rejected_metrics = OrderedDict()
 
         self.trial_rank_test_result = {}
         self.metric_rank_test_result = {}
+        self.metric_effect_size_result = {}
 
     @staticmethod
     def compile_tikz(crop=True, clean=True, **kwargs):
@@ -144,10 +200,84 @@ class MetricVisualizer:
             for f in findfile.find_cwd_files(".out", exclude_key=["ignore", ".pdf"]):
                 os.remove(f)
 
+    @staticmethod
+    def _plot_axes(ax=None, interactive=False):
+        """
+        Get the figure and axes to draw on. Without ax, a new figure is made on the Agg canvas,
+        out of the global pyplot state unless it is to be shown interactively, so plots can
+        render concurrently in threads or processes.
+        :param ax: the matplotlib Axes to draw on
+        :param interactive: whether the figure is to be shown by pyplot
+
+        :return: the figure, the axes and whether the figure is owned (and closed) by the plot
+        """
+        if ax is not None:
+            return ax.figure, ax, False
+        if interactive:
+            import matplotlib.pyplot as plt
+
+            fig = plt.figure()
+        else:
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            from matplotlib.figure import Figure
+
+            fig = Figure()
+            FigureCanvasAgg(fig)
+        return fig, fig.add_subplot(), True
+
+    @staticmethod
+    def _finish_plot(fig, engine, save_path, show, close, dpi=1000):
+        """
+        Save, show or print (tikz) a figure, and close it if the plot owns it.
+
+        :return: the save path for the tikz engine, otherwise None
+        """
+        try:
+            if engine != "tikz":
+                if save_path is not None:
+                    fig.savefig(
+                        save_path, dpi=dpi, format="svg" if engine == "svg" else None
+                    )
+                if show:
+                    import matplotlib.pyplot as plt
+
+                    plt.show()
+            else:
+                import tikzplotlib
+
+                tex_code = tikzplotlib.get_tikz_code(figure=fig)
+                tex_code = tex_template.replace("$tikz_code$", tex_code)
+                if save_path is not None:
+                    with open(save_path, "w", encoding="utf8") as f:
+                        f.write(tex_code)
+                if show:
+                    print(tex_code)
+
+                return save_path
+        finally:
+            if close:
+                if fig.canvas.manager is not None:
+                    import matplotlib.pyplot as plt
+
+                    plt.close(fig)
+                # release the artists now instead of at the next garbage collection
+                fig.clear()
+
     def next_trial(self):
         self.trial_id += 1
         self.dump()
 
+    def _new_metric_list(self, value):
+        if getattr(self, "reservoir_size", None) is not None:
+            return ReservoirMetricList(
+                [value],
+                size=self.reservoir_size,
+                stratified=self.stratified,
+                sketch=self.reservoir_size == 0
+                or getattr(self, "sketch_quantiles", False),
+            )
+        return MetricList([value])
+
     def add_metric(self, metric_name="Accuracy", value=0):
         """
         Add a metric to the metric dict.
@@ -162,32 +292,48 @@ class MetricVisualizer:
         # add the metric to the metric dict
         if metric_name in self.metrics:
             if trial_name not in self.metrics[metric_name]:
-                self.metrics[metric_name][trial_name] = MetricList([value])
+                self.metrics[metric_name][trial_name] = self._new_metric_list(value)
             else:
                 self.metrics[metric_name][trial_name].append(value)
         else:
-            self.metrics[metric_name] = {trial_name: MetricList([value])}
+            self.metrics[metric_name] = {trial_name: self._new_metric_list(value)}
+        self._touch()
+        self._notify_live()
         return self
 
-    def log(self, trial_name=None, metric_name=None, value=0, unit=None):
+    def log(self, trial_name=None, metric_name=None, value=0, unit=None, **kwargs):
         """
         Add a metric to the metric dict based on the trial name and metric name.
         :param trial_name: the name of the trial, such as algo names, model names, config names, epochs, etc.
         :param metric_name: the name of the metric, such as accuracy, loss, f1, etc.
         :param value: the value of the metric
         :param unit: the unit of the metric, such as %, ms, etc.
+        :param kwargs: the outlier screening options of log_metric
 
         :return: None
         """
-        self.log_metric(trial_name, metric_name, value, unit)
+        self.log_metric(trial_name, metric_name, value, unit, **kwargs)
 
-    def log_metric(self, trial_name=None, metric_name=None, value=0, unit=None):
+    def log_metric(
+        self,
+        trial_name=None,
+        metric_name=None,
+        value=0,
+        unit=None,
+        screen_outliers=False,
+        outlier_constant=1.5,
+        screen_warmup=10,
+    ):
         """
         Add a metric to the metric dict based on the trial name and metric name.
         :param trial_name: the name of the trial, such as algo names, model names, config names, epochs, etc.
         :param metric_name: the name of the metric, such as accuracy, loss, f1, etc.
         :param value: the value of the metric
         :param unit: the unit of the metric, such as %, ms, etc.
+        :param screen_outliers: check the value against the streaming quartiles of its cell first,
+            an outlier goes to self.rejected_metrics instead of the metric dict
+        :param outlier_constant: the value is an outlier outside [Q1 - c * IQR, Q3 + c * IQR]
+        :param screen_warmup: the number of values of a cell accepted before screening starts
 
         :return: None
         """
@@ -202,19 +348,226 @@ class MetricVisualizer:
                 len(self.metrics[metric_name]) + 1 if metric_name in self.metrics else 1
             )
 
+        if screen_outliers and self._screen_outlier(
+            trial_name, metric_name, value, outlier_constant, screen_warmup
+        ):
+            return self
+
         # add the metric to the metric dict
         if metric_name in self.metrics:
             if trial_name not in self.metrics[metric_name]:
-                self.metrics[metric_name][trial_name] = MetricList([value])
+                self.metrics[metric_name][trial_name] = self._new_metric_list(value)
             else:
                 self.metrics[metric_name][trial_name].append(value)
         else:
-            self.metrics[metric_name] = {trial_name: MetricList([value])}
+            self.metrics[metric_name] = {trial_name: self._new_metric_list(value)}
 
         # sort the data by metric name
         self.metrics = OrderedDict(natsort.natsorted(self.metrics.items()))
+        self._touch()
+        self._notify_live()
         return self
 
+    def _running_stats(self, metric_name, trial_name):
+        """
+        Get the RunningStats of a cell, pushing the values logged since the last call.
+        The stats are rebuilt if the cell was replaced or edited other than by append/extend.
+        """
+        if not hasattr(self, "running_stats"):
+            self.running_stats = {}
+        values = self.metrics[metric_name][trial_name]
+        if isinstance(values, ReservoirMetricList):
+            return values.running
+        version, edits = getattr(values, "version", 0), getattr(values, "edits", 0)
+        with self._running_stats_lock:
+            source, synced, stats = self.running_stats.setdefault(metric_name, {}).get(
+                trial_name, (None, None, None)
+            )
+            if source is values and synced == (version, edits):
+                return stats
+            if source is not values or synced[1] != edits:
+                stats = RunningStats()
+            for value in values[stats.seen :]:
+                stats.push(value)
+            self.running_stats[metric_name][trial_name] = (
+                values,
+                (version, edits),
+                stats,
+            )
+        return stats
+
+    def confidence_sequence(self, metric_name, trial_name, alpha=0.05, rho=10):
+        """
+        Get the anytime-valid confidence sequence of the mean of a cell, safe to check after every log_metric.
+        :param metric_name: the name of the metric
+        :param trial_name: the name of the trial
+        :param alpha: the error rate over all the checks
+        :param rho: the number of repeats the interval is tightest around
+
+        :return: a (low, high) tuple
+        """
+        return self._running_stats(metric_name, trial_name).confidence_sequence(
+            alpha, rho
+        )
+
+    def is_settled(
+        self,
+        metric_name,
+        trial1,
+        trial2,
+        alpha=0.05,
+        tol=0.0,
+        rho=10,
+        interval_alpha=None,
+    ):
+        """
+        Check if more repeats can still change the comparison of two trials on a metric.
+        The pair is settled once the confidence sequences of both trial means are disjoint,
+        or once both fit in a range no wider than tol (the trials are equivalent).
+        :param metric_name: the name of the metric
+        :param trial1: the name of the first trial
+        :param trial2: the name of the second trial
+        :param alpha: the error rate over all the checks
+        :param tol: the difference of means small enough to ignore
+        :param rho: the number of repeats the intervals are tightest around
+        :param interval_alpha: the error rate of each of the two confidence sequences,
+            alpha / 2 by default, so that alpha holds for the pair
+
+        :return: True if the pair is settled
+        """
+        if interval_alpha is None:
+            interval_alpha = alpha / 2
+        low1, high1 = self.confidence_sequence(metric_name, trial1, interval_alpha, rho)
+        low2, high2 = self.confidence_sequence(metric_name, trial2, interval_alpha, rho)
+        if high1 < low2 or high2 < low1:
+            return True
+        return max(high1, high2) - min(low1, low2) <= tol
+
+    def is_ranking_settled(self, metric_name, alpha=0.05, tol=0.0, rho=10):
+        """
+        Check if more repeats can still change the order of the trials on a metric,
+        i.e. if every pair of trials adjacent by mean is settled (see is_settled).
+        :param metric_name: the name of the metric
+        :param alpha: the error rate over all the checks and trials
+        :param tol: the difference of means small enough to ignore
+        :param rho: the number of repeats the intervals are tightest around
+
+        :return: True if the ranking is settled
+        """
+        trials = sorted(
+            self.metrics[metric_name],
+            key=lambda trial: self._running_stats(metric_name, trial).mean,
+        )
+        interval_alpha = alpha / len(trials)
+        return all(
+            self.is_settled(
+                metric_name, t1, t2, tol=tol, rho=rho, interval_alpha=interval_alpha
+            )
+            for t1, t2 in zip(trials[:-1], trials[1:])
+        )
+
+    def enough_repeats(
+        self,
+        metric_name,
+        trial_name=None,
+        ci_width=None,
+        alpha=0.05,
+        tol=0.0,
+        rho=10,
+    ):
+        """
+        Tell an experiment driver whether it can stop repeating a trial (or all trials) of a metric.
+        Statistics are updated incrementally, so calling it after every log_metric costs O(1)
+        per new value plus O(k log k) for k trials.
+        :param metric_name: the name of the metric
+        :param trial_name: the trial to check, or None to check the ranking of all trials
+        :param ci_width: also stop once the confidence sequence of the trial (or of every trial) is narrower
+        :param alpha: the error rate over all the checks
+        :param tol: the difference of means small enough to ignore
+        :param rho: the number of repeats the intervals are tightest around
+
+        :return: True if enough repeats were logged
+        """
+        trials = list(self.metrics[metric_name])
+        interval_alpha = alpha / len(trials)
+        if ci_width is not None:
+            checked = [trial_name] if trial_name is not None else trials
+            widths = [
+                np.subtract(
+                    *self.confidence_sequence(metric_name, t, interval_alpha, rho)[::-1]
+                )
+                for t in checked
+            ]
+            if max(widths) <= ci_width:
+                return True
+        if trial_name is None:
+            return self.is_ranking_settled(metric_name, alpha, tol, rho)
+        return all(
+            self.is_settled(
+                metric_name,
+                trial_name,
+                t,
+                tol=tol,
+                rho=rho,
+                interval_alpha=interval_alpha,
+            )
+            for t in trials
+            if t != trial_name
+        )
+
+    def live(self, refresh_hz=2, metrics=None, trend_length=20, stream=None):
+        """
+        Show a live terminal view of the mean/std/count and the recent trend of every cell,
+        redrawn in place by a background thread after new values are logged.
+        Use it as a context manager around a training loop, or call stop() on the result.
+        :param refresh_hz: the maximum number of redraws per second
+        :param metrics: the names of the metrics to show, all of them by default
+        :param trend_length: the number of recent values drawn in the trend sparkline
+        :param stream: the stream to draw to, sys.stdout by default
+
+        :return: the started LiveDashboard
+        """
+        if getattr(self, "_live", None) is not None:
+            self._live.stop()
+        self._live = LiveDashboard(
+            self,
+            refresh_hz=refresh_hz,
+            metrics=metrics,
+            trend_length=trend_length,
+            stream=stream,
+        )
+        return self._live.start()
+
+    def _notify_live(self):
+        live = getattr(self, "_live", None)
+        if live is not None:
+            live.notify()
+
+    def _screen_outlier(
+        self, trial_name, metric_name, value, outlier_constant=1.5, screen_warmup=10
+    ):
+        """
+        Check a value against the streaming quartiles of its cell, every value updates them.
+        Outliers are appended to self.rejected_metrics[metric_name][trial_name].
+
+        :return: True if the value is an outlier
+        """
+        if not hasattr(self, "outlier_sketches"):
+            self.outlier_sketches = {}
+            self.rejected_metrics = OrderedDict()
+        sketch = self.outlier_sketches.setdefault(metric_name, {}).setdefault(
+            trial_name, StreamingIQR()
+        )
+        outlier = sketch.count >= screen_warmup and sketch.is_outlier(
+            value, outlier_constant
+        )
+        sketch.push(value)
+        if outlier:
+            self.rejected_metrics.setdefault(metric_name, OrderedDict()).setdefault(
+                trial_name, []
+            ).append(value)
+        return outlier
+
     def set_trial_names(self, trial_names):
         """
         Set the trial names.
@@ -226,6 +579,7 @@ class MetricVisualizer:
             self.metrics[metric_name] = OrderedDict(
                 zip(trial_names, self.metrics[metric_name].values())
             )
+        self._touch()
 
     def set_trial_colors(self, trial_colors):
         """
@@ -246,6 +600,7 @@ class MetricVisualizer:
         :return: None
         """
         self.metrics = OrderedDict(zip(metric_names, self.metrics.values()))
+        self._touch()
 
     def set_metric_colors(self, metric_colors):
         """
@@ -258,302 +613,106 @@ class MetricVisualizer:
             for trial_name in self.metrics[metric_name]:
                 self.metrics[metric_name][trial_name].color = metric_color
 
-    def box_plot(
-        self, by="trial", engine="matplotlib", save_path=None, show=True, **kwargs
-    ):
+    def plot_spec(self, kind="box", by="trial", **kwargs):
         """
-        Draw a box plot based on the metric name and trial name.
+        Compute the statistics and the layout of a plot, without drawing it. The spec
+        is drawn by render_plot_spec(), as many times and with as many engines as needed.
+        :param kind: the kind of plot, such as box, violin, scatter, trajectory or bar
         :param by: the name of the x-axis, such as trial, metric, etc.
-        :param engine: the engine to draw the box plot, such as matplotlib, tikz, etc.
-        :param save_path: the path to save the box plot
-        :param show: whether to show the box plot
+        :param kwargs: the keyword arguments of the plot method of the kind
 
-        :return: None
+        :return: a PlotSpec, see metric_visualizer.plot_spec
         """
-        import matplotlib.pyplot as plt
-
-        plt.cla()
-
         if by == "trial":
             plot_metrics = self.metrics
         else:
             plot_metrics = self.transpose()
+        if kind in ["trajectory", "bar"]:
+            # the palettes the random markers, colors and hatches are drawn from
+            kwargs["markers"] = kwargs.get("markers") or self.MARKERS
+            kwargs["colors"] = kwargs.get("colors") or self.COLORS
+            kwargs["hatches"] = kwargs.get("hatches") or self.HATCHES
+        return build_plot_spec(plot_metrics, kind, by=by, **kwargs)
 
-        width = kwargs.pop("widths", 0.9)
-
-        # get the number of metrics
-        num_metrics = len(plot_metrics.keys())
-        # get the number of trials
-        num_trials = len(plot_metrics[list(plot_metrics.keys())[0]].keys())
-
-        # get the width of the box plot
-        width = width / num_metrics if kwargs.get("no_overlap", True) else width
-
-        # get the xtick labels
-        xtick_labels = list(plot_metrics[list(plot_metrics.keys())[0]].keys())
-        # get the xticks
-        xticks = (
-            np.arange(num_trials) + width * num_metrics
-            if kwargs.get("no_overlap", True)
-            else np.arange(num_trials) + width / 2
+    @staticmethod
+    def render_plot_spec(
+        spec, engine="matplotlib", save_path=None, show=True, ax=None, dpi=1000
+    ):
+        """
+        Draw a plot spec, no statistic is computed here.
+        :param spec: the PlotSpec, see plot_spec()
+        :param engine: the engine to draw the plot, such as matplotlib, svg, tikz, etc.
+        :param save_path: the path to save the plot
+        :param show: whether to show the plot
+        :param ax: the matplotlib Axes to draw on, a new figure by default
+        :param dpi: the resolution of the saved image
+
+        :return: the save path for the tikz engine, otherwise None
+        """
+        fig, ax, own_figure = MetricVisualizer._plot_axes(ax, show and engine != "tikz")
+        draw_plot_spec(spec, ax)
+        if spec.options.get("tight_layout", True):
+            fig.tight_layout()
+        return MetricVisualizer._finish_plot(
+            fig, engine, save_path, show, own_figure, dpi=dpi
         )
 
-        # get the colors
-        colors = plt.cm.jet(np.linspace(0, 1, num_metrics))
-        box_parts = []
-        # draw the box plot
-        ax = plt.subplot()
-        for i, metric_name in enumerate(plot_metrics.keys()):
-            # get the values
-            values = list(plot_metrics[metric_name].values())
-            # draw the box plot
-            box_part = ax.boxplot(
-                values,
-                labels=xtick_labels,
-                positions=(
-                    xticks + i * width if kwargs.get("no_overlap", True) else xticks
-                ),
-                widths=width * 0.9,
-                # patch_artist=kwargs.get("patch_artist", True),
-                boxprops=dict(linewidth=2, color=colors[i]),
-                capprops=dict(linewidth=2, color=colors[i]),
-                whiskerprops=dict(linewidth=2, color=colors[i]),
-                flierprops=dict(
-                    linewidth=2, color=colors[i], markeredgecolor=colors[i]
-                ),
-                medianprops=dict(linewidth=2, color=colors[i]),
-                **kwargs.get("boxplot_kwargs", {}),
-            )
-
-            box_parts.append(box_part["boxes"][0])
-
-            for item in ["boxes", "whiskers", "fliers", "medians", "caps"]:
-                plt.setp(box_part[item], color=colors[i])
-
-            plt.setp(box_part["fliers"], markeredgecolor=colors[i])
-
-        if kwargs.get("legend", True):
-            ax.legend(
-                box_parts, list(plot_metrics.keys()), loc=kwargs.pop("legend_loc", 1)
-            )
-
-        if kwargs.get("minor_ticks", True):
-            ax.minorticks_on()
-
-        if kwargs.get("grid", True):
-            ax.grid(which="major", linestyle="-", linewidth="0.3", color="grey")
-            ax.grid(which="minor", linestyle=":", linewidth="0.3", color="grey")
+    def box_plot(
+        self,
+        by="trial",
+        engine="matplotlib",
+        save_path=None,
+        show=True,
+        ax=None,
+        **kwargs,
+    ):
+        """
+        Draw a box plot based on the metric name and trial name.
+        :param by: the name of the x-axis, such as trial, metric, etc.
+        :param engine: the engine to draw the box plot, such as matplotlib, svg, tikz, etc.
+        :param save_path: the path to save the box plot
+        :param show: whether to show the box plot
+        :param ax: the matplotlib Axes to draw on, a new figure by default
 
-        plt.xticks(
-            kwargs.get(
-                "xticks",
-                xticks + i / 2 * width if kwargs.get("no_overlap", True) else xticks,
-            ),
-            (
-                xtick_labels
-                if not kwargs.get("xticklabels", None)
-                else kwargs.get("xticklabels")
-            ),
-            rotation=kwargs.pop("xrotation", 0),
-            horizontalalignment=kwargs.pop("horizontalalignment", "center"),
-            # verticalalignment=kwargs.pop("verticalalignment", "top"),
-            **kwargs.pop("xticks_kwargs", {}),
-        )
-        plt.yticks(
-            rotation=kwargs.pop("yrotation", 0),
-            horizontalalignment=kwargs.pop("horizontalalignment", "right"),
-            verticalalignment=kwargs.pop("verticalalignment", "center"),
-            **kwargs.pop("yticks_kwargs", {}),
+        :return: None
+        """
+        dpi = kwargs.pop("dpi", 1000)
+        return self.render_plot_spec(
+            self.plot_spec("box", by, **kwargs), engine, save_path, show, ax, dpi=dpi
         )
 
-        plt.xlabel(kwargs.pop("xlabel", "Trial Name"))
-        plt.ylabel(kwargs.pop("ylabel", "Metric Value"))
-
-        if kwargs.get("tight_layout", True):
-            plt.tight_layout()
-
-        # if kwargs.get("xticklabels", True):
-        #     ax.set_xticklabels(
-        #         [metric_name for metric_name in metrics],
-        #         rotation=kwargs.pop("rotation", 0),
-        #         rotation_mode=kwargs.pop("rotation_mode", "anchor"),
-        #         horizontalalignment=kwargs.pop("horizontalalignment", "center"),
-        #         # verticalalignment=kwargs.pop("verticalalignment", "top"),
-        #         **kwargs.pop("xticklabels_kwargs", {}),
-        #     )
-        # if kwargs.get("yticklabels", True):
-        #     ax.set_yticklabels(
-        #         [metric_name for metric_name in metrics],
-        #         rotation=kwargs.pop("rotation", 0),
-        #         rotation_mode=kwargs.pop("rotation_mode", "anchor"),
-        #         horizontalalignment=kwargs.pop("horizontalalignment", "center"),
-        #         verticalalignment=kwargs.pop("verticalalignment", "baseline"),
-        #         **kwargs.pop("yticklabels_kwargs", {}),
-        #     )
-        if engine != "tikz":
-            # save the box plot
-            if save_path is not None:
-                plt.savefig(save_path, dpi=kwargs.pop("dpi", 1000))
-            # show the box plot
-            if show:
-                plt.show()
-        else:
-            import tikzplotlib
-
-            tex_code = tikzplotlib.get_tikz_code()
-            tex_code = tex_template.replace("$tikz_code$", tex_code)
-            if save_path is not None:
-                with open(save_path, "w", encoding="utf8") as f:
-                    f.write(tex_code)
-            if show:
-                print(tex_code)
-
-            return save_path
-
     def violin_plot(
-        self, by="trial", engine="matplotlib", save_path=None, show=True, **kwargs
+        self,
+        by="trial",
+        engine="matplotlib",
+        save_path=None,
+        show=True,
+        ax=None,
+        **kwargs,
     ):
         """
         Draw a violin plot based on the metric name and trial name.
         :param by: the name of the x-axis, such as trial, metric, etc.
-        :param engine: the engine to draw the violin plot, such as matplotlib, tikz, etc.
+        :param engine: the engine to draw the violin plot, such as matplotlib, svg, tikz, etc.
         :param save_path: the path to save the violin plot
         :param show: whether to show the violin plot
+        :param ax: the matplotlib Axes to draw on, a new figure by default
 
         :return: None
         """
-        import matplotlib.pyplot as plt
-
-        plt.cla()
-
-        if by == "trial":
-            plot_metrics = self.metrics
-        else:
-            plot_metrics = self.transpose()
-
-        width = kwargs.pop("width", 0.9)
-
-        # get the number of metrics
-        num_metrics = len(plot_metrics.keys())
-        # get the number of trials
-        num_trials = len(plot_metrics[list(plot_metrics.keys())[0]].keys())
-
-        # get the width of the violin plot
-        width = width / num_metrics if kwargs.get("no_overlap", True) else width
-        # get the xticks
-        xticks = (
-            np.arange(num_trials) + width / 2
-            if kwargs.get("no_overlap", True)
-            else np.arange(num_trials)
+        dpi = kwargs.pop("dpi", 1000)
+        return self.render_plot_spec(
+            self.plot_spec("violin", by, **kwargs), engine, save_path, show, ax, dpi=dpi
         )
-        xtick_labels = list(plot_metrics[list(plot_metrics.keys())[0]].keys())
-        # get the xtick labels
-
-        violin_parts = []
-        # draw the violin plot
-        ax = plt.subplot()
-        for i, metric_name in enumerate(plot_metrics.keys()):
-            # get the values
-            values = list(plot_metrics[metric_name].values())
-            # draw the violin plot
-            violin = ax.violinplot(
-                values,
-                positions=(
-                    xticks + i * width if kwargs.get("no_overlap", True) else xticks
-                ),
-                widths=width * 0.9,
-                showmeans=kwargs.get("showmeans", False),
-                showmedians=kwargs.get("showmedians", True),
-                showextrema=kwargs.get("showextrema", True),
-                bw_method=kwargs.get("bw_method", "scott"),
-                **kwargs.get("violinplot_kwargs", {}),
-            )
-
-            violin_parts.append(violin["bodies"][0])
-
-        if kwargs.get("legend", True):
-            plt.legend(
-                violin_parts, plot_metrics.keys(), loc=kwargs.pop("legend_loc", 1)
-            )
-
-        for pc in violin["bodies"]:
-            pc.set_linewidth(kwargs.pop("linewidth", 3))
-
-        if kwargs.get("minor_ticks", True):
-            plt.minorticks_on()
-
-        if kwargs.get("grid", True):
-            plt.grid(which="major", linestyle="-", linewidth="0.3", color="grey")
-            plt.grid(which="minor", linestyle=":", linewidth="0.3", color="grey")
-
-        plt.xticks(
-            kwargs.get(
-                "xticks",
-                xticks + i * width / 2 if kwargs.get("no_overlap", True) else xticks,
-            ),
-            (
-                xtick_labels
-                if not kwargs.get("xticklabels", None)
-                else kwargs.get("xticklabels")
-            ),
-            rotation=kwargs.pop("xrotation", 0),
-            horizontalalignment=kwargs.pop("horizontalalignment", "center"),
-            # verticalalignment=kwargs.pop("verticalalignment", "top"),
-            **kwargs.pop("xticks_kwargs", {}),
-        )
-        plt.yticks(
-            rotation=kwargs.pop("yrotation", 0),
-            horizontalalignment=kwargs.pop("horizontalalignment", "right"),
-            verticalalignment=kwargs.pop("verticalalignment", "center"),
-            **kwargs.pop("yticks_kwargs", {}),
-        )
-
-        plt.xlabel(kwargs.pop("xlabel", "Trial Name"))
-        plt.ylabel(kwargs.pop("ylabel", "Metric Value"))
-
-        if kwargs.get("tight_layout", True):
-            plt.tight_layout()
-
-        # if kwargs.get("xticklabels", True):
-        #     ax.set_xticklabels(
-        #         [metric_name for metric_name in metrics],
-        #         rotation=kwargs.pop("rotation", 0),
-        #         rotation_mode=kwargs.pop("rotation_mode", "anchor"),
-        #         horizontalalignment=kwargs.pop("horizontalalignment", "center"),
-        #         # verticalalignment=kwargs.pop("verticalalignment", "top"),
-        #         **kwargs.pop("xticklabels_kwargs", {}),
-        #     )
-        # if kwargs.get("yticklabels", True):
-        #     ax.set_yticklabels(
-        #         [metric_name for metric_name in metrics],
-        #         rotation=kwargs.pop("rotation", 0),
-        #         rotation_mode=kwargs.pop("rotation_mode", "anchor"),
-        #         horizontalalignment=kwargs.pop("horizontalalignment", "center"),
-        #         verticalalignment=kwargs.pop("verticalalignment", "baseline"),
-        #         **kwargs.pop("yticklabels_kwargs", {}),
-        #     )
-        if engine != "tikz":
-            # save the violin plot
-            if save_path is not None:
-                plt.savefig(save_path, dpi=kwargs.pop("dpi", 1000))
-            # show the violin plot
-            if show:
-                plt.show()
-        else:
-            import tikzplotlib
-
-            tex_code = tikzplotlib.get_tikz_code()
-            tex_code = tex_template.replace("$tikz_code$", tex_code)
-            if save_path is not None:
-                with open(save_path, "w", encoding="utf8") as f:
-                    f.write(tex_code)
-            if show:
-                print(tex_code)
-
-            return save_path
 
     def pie_plot(
-        self, by="trial", engine="matplotlib", save_path=None, show=True, **kwargs
+        self,
+        by="trial",
+        engine="matplotlib",
+        save_path=None,
+        show=True,
+        ax=None,
+        **kwargs,
     ):
         """
         Draw a pie plot based on the metric name and trial name.
@@ -561,12 +720,11 @@ class MetricVisualizer:
         :param engine: the engine to draw the pie plot, such as matplotlib, tikz, etc.
         :param save_path: the path to save the pie plot
         :param show: whether to show the pie plot
+        :param ax: the matplotlib Axes to draw on, a new figure by default
 
         :return: None
         """
-        import matplotlib.pyplot as plt
-
-        plt.cla()
+        fig, ax, own_figure = self._plot_axes(ax, show and engine != "tikz")
         if by != "trial":
             plot_metrics = self.transpose()
         else:
@@ -585,14 +743,16 @@ class MetricVisualizer:
         ytick_labels = list(plot_metrics[list(plot_metrics.keys())[0]].keys())
         # get the ytick labels
 
+        # the central value of each slice, see metric_visualizer.stat_registry
+        method = kwargs.pop("method", "average")
+
         # draw the pie plot
-        ax = plt.subplot()
         for i, metric_name in enumerate(plot_metrics.keys()):
             # get the values
             values = list(plot_metrics[metric_name].values())
             # draw the pie plot
             pie = ax.pie(
-                [np.nanmean(vec) for vec in values],
+                compute_stat(method, values, "central"),
                 labels=ytick_labels,
                 center=kwargs.pop("center", (0, 0)),
                 **kwargs.pop("pieplot_kwargs", {}),
@@ -616,452 +776,108 @@ class MetricVisualizer:
         #         verticalalignment=kwargs.pop("verticalalignment", "baseline"),
         #         **kwargs.pop("yticklabels_kwargs", {}),
         #     )
-        if engine != "tikz":
-            # save the violin plot
-            if save_path is not None:
-                plt.savefig(save_path, dpi=kwargs.pop("dpi", 1000))
-            # show the violin plot
-            if show:
-                plt.show()
-        else:
-            import tikzplotlib
-
-            tex_code = tikzplotlib.get_tikz_code()
-            tex_code = tex_template.replace("$tikz_code$", tex_code)
-            if save_path is not None:
-                with open(save_path, "w", encoding="utf8") as f:
-                    f.write(tex_code)
-            if show:
-                print(tex_code)
-
-            return save_path
+        return self._finish_plot(
+            fig, engine, save_path, show, own_figure, dpi=kwargs.pop("dpi", 1000)
+        )
 
     def scatter_plot(
-        self, by="trial", engine="matplotlib", save_path=None, show=True, **kwargs
+        self,
+        by="trial",
+        engine="matplotlib",
+        save_path=None,
+        show=True,
+        ax=None,
+        **kwargs,
     ):
         """
         Draw a scatter plot based on the metric name and trial name.
         :param by: the name of the x-axis, such as trial, metric, etc.
-        :param engine: the engine to draw the scatter plot, such as matplotlib, tikz, etc.
+        :param engine: the engine to draw the scatter plot, such as matplotlib, svg, tikz, etc.
         :param save_path: the path to save the scatter plot
         :param show: whether to show the scatter plot
+        :param ax: the matplotlib Axes to draw on, a new figure by default
 
         :return: None
         """
-        import matplotlib.pyplot as plt
-
-        plt.cla()
-        if by != "trial":
-            plot_metrics = self.transpose()
-        else:
-            plot_metrics = self.metrics
-
-            # get the number of metrics
-        num_metrics = len(plot_metrics.keys())
-        # get the number of trials
-        num_trials = len(plot_metrics[list(plot_metrics.keys())[0]].keys())
-
-        # get the width of the scatter plot
-        width = 0.8 / num_metrics
-        # get the xticks
-        xticks = np.arange(num_trials) + 0.4
-        # get the xtick labels
-        xtick_labels = list(plot_metrics[list(plot_metrics.keys())[0]].keys())
-
-        # get the colors
-        colors = plt.cm.jet(np.linspace(0, 1, num_metrics))
-
-        # draw the scatter plot
-        ax = plt.subplot()
-        scatter_parts = []
-        for i, metric_name in enumerate(plot_metrics.keys()):
-            # get the values
-            values = list(plot_metrics[metric_name].values())
-            # draw the scatter plot
-            scatter_part = ax.scatter(
-                [[x] * len(values[0]) for x in (xticks + i * width)],
-                values,
-                color=colors[i],
-                **kwargs.get("scatter_kwargs", {}),
-            )
-
-            scatter_parts.append(scatter_part)
-
-        if kwargs.get("legend", True):
-            plt.legend(
-                scatter_parts, plot_metrics.keys(), loc=kwargs.pop("legend_loc", 1)
-            )
-
-        if kwargs.get("minor_ticks", True):
-            plt.minorticks_on()
-
-        if kwargs.get("grid", True):
-            plt.grid(which="major", linestyle="-", linewidth="0.3", color="grey")
-            plt.grid(which="minor", linestyle=":", linewidth="0.3", color="grey")
-
-        plt.xticks(
-            kwargs.get(
-                "xticks",
-                xticks + i * width / 2 if kwargs.get("no_overlap", True) else xticks,
-            ),
-            (
-                xtick_labels
-                if not kwargs.get("xtick_labels", None)
-                else kwargs.get("xtick_labels", None)
-            ),
-            rotation=kwargs.pop("xrotation", 0),
-            horizontalalignment=kwargs.pop("horizontalalignment", "center"),
-            # verticalalignment=kwargs.pop("verticalalignment", "top"),
-            **kwargs.pop("xticks_kwargs", {}),
-        )
-        plt.yticks(
-            rotation=kwargs.pop("yrotation", 0),
-            horizontalalignment=kwargs.pop("horizontalalignment", "right"),
-            verticalalignment=kwargs.pop("verticalalignment", "center"),
-            **kwargs.pop("yticks_kwargs", {}),
+        dpi = kwargs.pop("dpi", 1000)
+        return self.render_plot_spec(
+            self.plot_spec("scatter", by, **kwargs),
+            engine,
+            save_path,
+            show,
+            ax,
+            dpi=dpi,
         )
 
-        plt.xlabel(kwargs.pop("xlabel", "Trial Name"))
-        plt.ylabel(kwargs.pop("ylabel", "Metric Value"))
-
-        if kwargs.get("tight_layout", True):
-            plt.tight_layout()
-
-        # if kwargs.get("xticklabels", True):
-        #     ax.set_xticklabels(
-        #         [metric_name for metric_name in metrics],
-        #         rotation=kwargs.pop("rotation", 0),
-        #         rotation_mode=kwargs.pop("rotation_mode", "anchor"),
-        #         horizontalalignment=kwargs.pop("horizontalalignment", "center"),
-        #         # verticalalignment=kwargs.pop("verticalalignment", "top"),
-        #         **kwargs.pop("xticklabels_kwargs", {}),
-        #     )
-        # if kwargs.get("yticklabels", True):
-        #     ax.set_yticklabels(
-        #         [metric_name for metric_name in metrics],
-        #         rotation=kwargs.pop("rotation", 0),
-        #         rotation_mode=kwargs.pop("rotation_mode", "anchor"),
-        #         horizontalalignment=kwargs.pop("horizontalalignment", "center"),
-        #         verticalalignment=kwargs.pop("verticalalignment", "baseline"),
-        #         **kwargs.pop("yticklabels_kwargs", {}),
-        #     )
-        if engine != "tikz":
-            # save the scatter plot
-            if save_path is not None:
-                plt.savefig(save_path, dpi=kwargs.pop("dpi", 1000))
-            # show the scatter plot
-            if show:
-                plt.show()
-        else:
-            import tikzplotlib
-
-            tex_code = tikzplotlib.get_tikz_code()
-            tex_code = tex_template.replace("$tikz_code$", tex_code)
-            if save_path is not None:
-                with open(save_path, "w", encoding="utf8") as f:
-                    f.write(tex_code)
-            if show:
-                print(tex_code)
-
-            return save_path
-
     def trajectory_plot(
-        self, by="trial", engine="matplotlib", save_path=None, show=True, **kwargs
+        self,
+        by="trial",
+        engine="matplotlib",
+        save_path=None,
+        show=True,
+        ax=None,
+        **kwargs,
     ):
         """
         Draw a trajectory plot based on the metric name and trial name.
         :param by: the name of the x-axis, such as trial, metric, etc.
-        :param engine: the engine to draw the trajectory plot, such as matplotlib, tikz, etc.
+        :param engine: the engine to draw the trajectory plot, such as matplotlib, svg, tikz, etc.
         :param save_path: the path to save the trajectory plot
         :param show: whether to show the trajectory plot
+        :param ax: the matplotlib Axes to draw on, a new figure by default
 
         :return: None
         """
-        import matplotlib.pyplot as plt
-
-        plt.cla()
-
-        if by == "trial":
-            plot_metrics = self.metrics
-        else:
-            plot_metrics = self.transpose()
-
-        if not kwargs.get("markers", None):
-            markers = self.MARKERS[:]
-        else:
-            markers = kwargs.pop("markers")
-
-        if not kwargs.get("colors", None):
-            colors = self.COLORS[:]
-        else:
-            colors = kwargs.pop("colors")
-
-        traj_parts = []
-        ax = plt.subplot()
-
-        for metric_name in plot_metrics.keys():
-            metrics = plot_metrics[metric_name]
-
-            y = np.array([metrics[metric_name] for metric_name in metrics])
-            x = np.array(
-                [[i for i, label in enumerate(metrics)] for _ in range(y.shape[1])]
-            )
-
-            y_avg = np.average(y, axis=1)
-            y_std = np.std(y, axis=1)
-
-            marker = random.choice(markers)
-            markers.remove(marker)
-            if not colors:
-                colors = self.COLORS[:]
-            color = random.choice(colors)
-            colors.remove(color)
-
-            if kwargs.pop("avg_point", True):
-                avg_point = ax.plot(
-                    x[0],
-                    y_avg,
-                    marker=marker,
-                    color=color,
-                    markersize=kwargs.pop("markersize", 3),
-                    linewidth=kwargs.pop("linewidth", 3),
-                )
-
-            if kwargs.pop("traj_fill", True):
-                plt.subplot().fill_between(
-                    x[0],
-                    y_avg - y_std,
-                    y_avg + y_std,
-                    color=color,
-                    alpha=kwargs.pop("alpha", 0.2),
-                )
-
-            if kwargs.pop("traj_point", True):
-                plt.subplot().scatter(x, y, marker=marker, color=color)
-
-            traj_parts.append(avg_point[0])
-
-        if kwargs.get("legend", True):
-            plt.legend(
-                traj_parts, list(plot_metrics.keys()), loc=kwargs.pop("legend_loc", 1)
-            )
-
-        if kwargs.get("minor_ticks", True):
-            plt.minorticks_on()
-
-        if kwargs.get("grid", True):
-            plt.grid(which="major", linestyle="-", linewidth="0.3", color="grey")
-            plt.grid(which="minor", linestyle=":", linewidth="0.3", color="grey")
-
-        plt.xticks(
-            kwargs.get("xticks", list(range(len(metrics.keys())))),
-            (
-                list(metrics.keys())
-                if not kwargs.get("xticklabels", None)
-                else kwargs.get("xticklabels", None)
-            ),
-            rotation=kwargs.pop("xrotation", 0),
-            horizontalalignment=kwargs.pop("horizontalalignment", "center"),
-            **kwargs.pop("xticks_kwargs", {}),
+        dpi = kwargs.pop("dpi", 1000)
+        return self.render_plot_spec(
+            self.plot_spec("trajectory", by, **kwargs),
+            engine,
+            save_path,
+            show,
+            ax,
+            dpi=dpi,
         )
-        plt.yticks(
-            rotation=kwargs.pop("yrotation", 0),
-            horizontalalignment=kwargs.pop("horizontalalignment", "right"),
-            verticalalignment=kwargs.pop("verticalalignment", "center"),
-            **kwargs.pop("yticks_kwargs", {}),
-        )
-
-        plt.xlabel(kwargs.pop("xlabel", "Trial Name"))
-        plt.ylabel(kwargs.pop("ylabel", "Metric Value"))
-
-        if kwargs.get("tight_layout", True):
-            plt.tight_layout()
-
-        # if kwargs.get("xticklabels", True):
-        #     ax.set_xticklabels(
-        #         [metric_name for metric_name in metrics],
-        #         rotation=kwargs.pop("rotation", 0),
-        #         rotation_mode=kwargs.pop("rotation_mode", "anchor"),
-        #         horizontalalignment=kwargs.pop("horizontalalignment", "center"),
-        #         # verticalalignment=kwargs.pop("verticalalignment", "top"),
-        #         **kwargs.pop("xticklabels_kwargs", {}),
-        #     )
-        # if kwargs.get("yticklabels", True):
-        #     ax.set_yticklabels(
-        #         [metric_name for metric_name in metrics],
-        #         rotation=kwargs.pop("rotation", 0),
-        #         rotation_mode=kwargs.pop("rotation_mode", "anchor"),
-        #         horizontalalignment=kwargs.pop("horizontalalignment", "center"),
-        #         verticalalignment=kwargs.pop("verticalalignment", "baseline"),
-        #         **kwargs.pop("yticklabels_kwargs", {}),
-        #     )
-        if engine != "tikz":
-            # save the trajectory plot
-            if save_path is not None:
-                plt.savefig(save_path, dpi=kwargs.pop("dpi", 1000))
-            # show the trajectory plot
-            if show:
-                plt.show()
-        else:
-            import tikzplotlib
-
-            tex_code = tikzplotlib.get_tikz_code()
-            tex_code = tex_template.replace("$tikz_code$", tex_code)
-            if save_path is not None:
-                with open(save_path, "w", encoding="utf8") as f:
-                    f.write(tex_code)
-            if show:
-                print(tex_code)
-
-            return save_path
 
     def bar_plot(
-        self, by="trial", engine="matplotlib", save_path=None, show=True, **kwargs
+        self,
+        by="trial",
+        engine="matplotlib",
+        save_path=None,
+        show=True,
+        ax=None,
+        **kwargs,
     ):
         """
         Draw a bar plot based on the metric name and trial name.
         :param by: the name of the x-axis, such as trial, metric, etc.
-        :param engine: the engine to draw the bar plot, such as matplotlib, tikz, etc.
+        :param engine: the engine to draw the bar plot, such as matplotlib, svg, tikz, etc.
         :param save_path: the path to save the bar plot
         :param show: whether to show the bar plot
+        :param ax: the matplotlib Axes to draw on, a new figure by default
 
         :return: None
         """
-        import matplotlib.pyplot as plt
-
-        plt.cla()
-
-        if by == "trial":
-            plot_metrics = self.metrics
-        else:
-            plot_metrics = self.transpose()
-
-        if not kwargs.get("markers", None):
-            markers = self.MARKERS[:]
-        else:
-            markers = kwargs.pop("markers")
-
-        if not kwargs.get("colors", None):
-            colors = self.COLORS[:]
-        else:
-            colors = kwargs.pop("colors")
-
-        bar_parts = []
-        ax = plt.subplot()
-        total_width = 0.9
-        for i, metric_name in enumerate(plot_metrics.keys()):
-            metrics = plot_metrics[metric_name]
-            metric_num = len(plot_metrics.keys())
-            trial_num = len(plot_metrics[metric_name])
-            width = total_width / metric_num
-            x = np.arange(trial_num)
-            x = x - (total_width - width) / 2
-            x = x + i * width
-            Y = np.array(
-                [
-                    np.average(plot_metrics[m_name][trial])
-                    for m_name in plot_metrics.keys()
-                    for trial in plot_metrics[m_name]
-                    if metric_name == m_name
-                ]
-            )
-            hatch = random.choice(self.HATCHES)
-            color = random.choice(colors)
-            colors.remove(color)
-            bar = plt.bar(x, Y, width=width, hatch=hatch, color=color)
-            bar_parts.append(bar[0])
-
-            for i_x, j_x in zip(x, Y):
-                plt.text(
-                    i_x, j_x + max(Y) // 100, "%.1f" % j_x, ha="center", va="bottom"
-                )
-
-        if kwargs.get("legend", True):
-            plt.legend(
-                bar_parts, list(plot_metrics.keys()), loc=kwargs.pop("legend_loc", 1)
-            )
-
-        if kwargs.get("minor_ticks", True):
-            plt.minorticks_on()
-
-        if kwargs.get("grid", True):
-            plt.grid(which="major", linestyle="-", linewidth="0.3", color="grey")
-            plt.grid(which="minor", linestyle=":", linewidth="0.3", color="grey")
-
-        plt.xticks(
-            kwargs.get("xticks", list(range(len(metrics.keys())))),
-            list(metrics.keys()),
-            rotation=kwargs.pop("xrotation", 0),
-            horizontalalignment=kwargs.pop("horizontalalignment", "center"),
-            # verticalalignment=kwargs.pop("verticalalignment", "top"),
-            **kwargs.pop("xticks_kwargs", {}),
-        )
-        plt.yticks(
-            rotation=kwargs.pop("yrotation", 0),
-            horizontalalignment=kwargs.pop("horizontalalignment", "right"),
-            verticalalignment=kwargs.pop("verticalalignment", "center"),
-            **kwargs.pop("yticks_kwargs", {}),
+        dpi = kwargs.pop("dpi", 1000)
+        return self.render_plot_spec(
+            self.plot_spec("bar", by, **kwargs), engine, save_path, show, ax, dpi=dpi
         )
 
-        plt.xlabel(kwargs.pop("xlabel", "Trial Name"))
-        plt.ylabel(kwargs.pop("ylabel", "Metric Value"))
-
-        if kwargs.get("tight_layout", True):
-            plt.tight_layout()
-
-        # if kwargs.get("xticklabels", True):
-        #     ax.set_xticklabels(
-        #         [metric_name for metric_name in metrics],
-        #         rotation=kwargs.pop("rotation", 0),
-        #         rotation_mode=kwargs.pop("rotation_mode", "anchor"),
-        #         horizontalalignment=kwargs.pop("horizontalalignment", "center"),
-        #         # verticalalignment=kwargs.pop("verticalalignment", "top"),
-        #         **kwargs.pop("xticklabels_kwargs", {}),
-        #     )
-        # if kwargs.get("yticklabels", True):
-        #     ax.set_yticklabels(
-        #         [metric_name for metric_name in metrics],
-        #         rotation=kwargs.pop("rotation", 0),
-        #         rotation_mode=kwargs.pop("rotation_mode", "anchor"),
-        #         horizontalalignment=kwargs.pop("horizontalalignment", "center"),
-        #         verticalalignment=kwargs.pop("verticalalignment", "baseline"),
-        #         **kwargs.pop("yticklabels_kwargs", {}),
-        #     )
-
-        if engine != "tikz":
-            # save the bar plot
-            if save_path is not None:
-                plt.savefig(save_path, dpi=kwargs.pop("dpi", 1000))
-            # show the bar plot
-            if show:
-                plt.show()
-        else:
-            import tikzplotlib
-
-            tex_code = tikzplotlib.get_tikz_code()
-            tex_code = tex_template.replace("$tikz_code$", tex_code)
-            if save_path is not None:
-                with open(save_path, "w", encoding="utf8") as f:
-                    f.write(tex_code)
-            if show:
-                print(tex_code)
-
-            return save_path
-
     def a12_bar_plot(
         self,
         target_trial=None,
         engine="matplotlib",
         save_path=None,
         show=True,
+        ax=None,
         **kwargs,
     ):
         """
         Draw a bar plot based on the metric name and trial name.
         :param target_trial:  the target trial to compare with other trials
-        :param engine: the engine to draw the bar plot, such as matplotlib, tikz, etc.
+        :param engine: the engine to draw the bar plot, such as matplotlib, svg, tikz, etc.
         :param save_path: the path to save the bar plot
         :param show: whether to show the bar plot
+        :param ax: the matplotlib Axes to draw on, a new figure by default
 
         :return: None
         """
@@ -1121,7 +937,14 @@ class MetricVisualizer:
                             cmd = cmd.replace(
                                 "$num$", str(len(plot_metrics[trial1][metric]))
                             )
-                            res = robjects.r(cmd)
+                            res = stat_test_cache.get_or_compute(
+                                "a12",
+                                (
+                                    plot_metrics[trial1][metric],
+                                    plot_metrics[trial2][metric],
+                                ),
+                                lambda: str(robjects.r(cmd)),
+                            )
 
                             if "large" in str(res):
                                 new_plot_metrics["large"][trial1][0] += 1
@@ -1208,7 +1031,11 @@ class MetricVisualizer:
                         ),
                     )
                     cmd = cmd.replace("$num$", str(len(plot_metrics[trial1][metric])))
-                    res = robjects.r(cmd)
+                    res = stat_test_cache.get_or_compute(
+                        "a12",
+                        (plot_metrics[trial1][metric], plot_metrics[trial2][metric]),
+                        lambda: str(robjects.r(cmd)),
+                    )
 
                     if "large" in str(res):
                         new_plot_metrics["large"][trial2][0] += 1
@@ -1249,37 +1076,66 @@ class MetricVisualizer:
 
         mv = MetricVisualizer(name=self.name + " A12", metrics=plot_metrics)
         return mv.bar_plot(
-            by="trial", engine=engine, save_path=save_path, show=show, **kwargs
+            by="trial", engine=engine, save_path=save_path, show=show, ax=ax, **kwargs
         )
 
     def sk_rank_plot(
-        self, plot_type="box", engine="matplotlib", save_path=None, show=True, **kwargs
+        self,
+        plot_type="box",
+        engine="matplotlib",
+        save_path=None,
+        show=True,
+        ax=None,
+        n_jobs=1,
+        seed=0,
+        **kwargs,
     ):
         """
         Draw a rank plot based on the metric name and trial name.
         :param plot_type: the type of the rank plot, such as box, violin, etc.
-        :param engine: the engine to draw the bar plot, such as matplotlib, tikz, etc.
+        :param engine: the engine to draw the bar plot, such as matplotlib, svg, tikz, etc.
         :param save_path: the path to save the bar plot
         :param show: whether to show the bar plot
+        :param ax: the matplotlib Axes to draw on, a new figure by default
+        :param n_jobs: the number of processes ranking the metrics, None or -1 for all cores
+        :param seed: the seed of the bootstrap tests, each metric gets its own stream
 
         :return: None
         """
 
-        from metric_visualizer.external import Rx
+        from metric_visualizer.external import rankJob
 
         # metrics = self.transpose()
         metrics = self.metrics
+        for metric, trials in metrics.items():
+            for trial, values in trials.items():
+                if not len(values):
+                    raise ValueError(
+                        "The Scott-Knott rank test needs the values of every cell, but "
+                        "({}, {}) keeps none (reservoir_size=0?)".format(metric, trial)
+                    )
 
-        Rx.list_algorithm_rank = []
-        data_dict = {"Scott-Knott Rank Test": {}}
+        seeds = np.random.SeedSequence(seed).spawn(len(metrics))
+        jobs = [
+            (
+                metric,
+                {trial: list(v) for trial, v in metrics[metric].items()},
+                int(s.generate_state(1)[0]),
+            )
+            for metric, s in zip(metrics, seeds)
+        ]
+        if n_jobs is None or n_jobs < 0:
+            n_jobs = os.cpu_count()
+        if n_jobs > 1 and len(jobs) > 1:
+            with multiprocessing.Pool(min(n_jobs, len(jobs))) as pool:
+                results = pool.map(rankJob, jobs)
+        else:
+            results = [rankJob(job) for job in jobs]
 
-        for metric in metrics:
-            Rx.data(**metrics[metric])
-            for i, d in enumerate(natsort.natsorted(Rx.list_algorithm_rank)):
-                data_dict["Scott-Knott Rank Test"][d[0]] = data_dict[
-                    "Scott-Knott Rank Test"
-                ].get(d[0], [])
-                data_dict["Scott-Knott Rank Test"][d[0]].append(d[1])
+        data_dict = {"Scott-Knott Rank Test": {}}
+        for metric, ranks in results:
+            for trial, rank in natsort.natsorted(ranks.items()):
+                data_dict["Scott-Knott Rank Test"].setdefault(trial, []).append(rank)
 
         mv = MetricVisualizer(
             name=self.name + ".sk_rank",
@@ -1290,6 +1146,7 @@ class MetricVisualizer:
                 engine=engine,
                 save_path=save_path,
                 show=show,
+                ax=ax,
                 ylabel="Scott-Knott Rank",
                 **kwargs,
             )
@@ -1298,30 +1155,322 @@ class MetricVisualizer:
                 engine=engine,
                 save_path=save_path,
                 show=show,
+                ax=ax,
                 ylabel="Scott-Knott Rank",
                 **kwargs,
             )
 
-    def remove_outliers(self, outlier_constant=1.5):
+    def cd_plot(
+        self,
+        larger_is_better=True,
+        alpha=0.05,
+        engine="matplotlib",
+        save_path=None,
+        show=True,
+        ax=None,
+        **kwargs,
+    ):
+        """
+        Draw a critical difference diagram of the Friedman/Nemenyi test over all metrics.
+        :param larger_is_better: whether a larger metric value ranks first, a bool or a {metric: bool} dict
+        :param alpha: the significance level of the critical difference
+        :param engine: the engine to draw the cd plot, such as matplotlib, tikz, etc.
+        :param save_path: the path to save the cd plot
+        :param show: whether to show the cd plot
+        :param ax: the matplotlib Axes to draw on, a new figure by default
+
+        :return: None
+        """
+        fig, ax, own_figure = self._plot_axes(ax, show and engine != "tikz")
+
+        result = self.friedman_test(larger_is_better=larger_is_better, alpha=alpha)
+        avg_ranks = result["average_ranks"]
+        cd = result["critical_difference"]
+        names, ranks = list(avg_ranks.index), avg_ranks.values
+        k = len(ranks)
+        margin = kwargs.pop("margin", max(1.0, k / 3))
+        clique_color = kwargs.pop("clique_color", "black")
+        clique_linewidth = kwargs.pop("clique_linewidth", 4)
+
+        ax.set_xlim(1 - margin, k + margin)
+        ax.set_ylim(0, 1)
+        ax.axis("off")
+
+        # the rank axis
+        axis_y = 0.8
+        ax.plot([1, k], [axis_y, axis_y], color="black", linewidth=1)
+        for tick in range(1, k + 1):
+            ax.plot([tick, tick], [axis_y, axis_y + 0.02], color="black", linewidth=1)
+            ax.text(tick, axis_y + 0.03, str(tick), ha="center", va="bottom")
+
+        # the critical difference
+        ax.plot([1, 1 + cd], [0.95, 0.95], color="black", linewidth=2)
+        ax.text(1 + cd / 2, 0.96, "CD = %.2f" % cd, ha="center", va="bottom")
+
+        # the trials, the better half on the left
+        half = (k + 1) // 2
+        step = 0.6 / max(half, k - half)
+        for i, (name, rank) in enumerate(zip(names, ranks)):
+            if i < half:
+                y, end, ha = axis_y - 0.1 - i * step, 1 - margin / 4, "right"
+            else:
+                y, end, ha = axis_y - 0.1 - (k - 1 - i) * step, k + margin / 4, "left"
+            ax.plot([rank, rank, end], [axis_y, y, y], color="black", linewidth=1)
+            ax.text(end, y, " %s (%.2f) " % (name, rank), ha=ha, va="center")
+
+        # the groups of trials not significantly different
+        cliques = []
+        for i in range(k):
+            j = np.searchsorted(ranks, ranks[i] + cd, side="left") - 1
+            if j > i and not (cliques and cliques[-1][1] >= j):
+                cliques.append((i, j))
+        for c, (i, j) in enumerate(cliques):
+            y = axis_y - 0.04 - c * 0.03
+            ax.plot(
+                [ranks[i] - 0.05, ranks[j] + 0.05],
+                [y, y],
+                color=clique_color,
+                linewidth=clique_linewidth,
+            )
+
+        if kwargs.get("tight_layout", True):
+            fig.tight_layout()
+
+        return self._finish_plot(
+            fig, engine, save_path, show, own_figure, dpi=kwargs.pop("dpi", 1000)
+        )
+
+    PLOT_KINDS = {
+        "box": "box_plot",
+        "violin": "violin_plot",
+        "pie": "pie_plot",
+        "scatter": "scatter_plot",
+        "trajectory": "trajectory_plot",
+        "bar": "bar_plot",
+        "a12_bar": "a12_bar_plot",
+        "sk_rank": "sk_rank_plot",
+        "cd": "cd_plot",
+    }
+
+    def _data_digest(self):
+        """Hash the names and values of all the cells, and the exact statistics of the sampled cells."""
+        h = hashlib.sha1()
+        for metric_name, trial_data in self.metrics.items():
+            for trial_name, values in trial_data.items():
+                data = np.asarray(getattr(values, "data", values), dtype=float)
+                h.update(repr((metric_name, trial_name, len(data))).encode("utf8"))
+                h.update(data.tobytes())
+                if isinstance(values, ReservoirMetricList):
+                    h.update(
+                        repr(
+                            (
+                                values.count,
+                                values.avg,
+                                values.std,
+                                values.min,
+                                values.max,
+                            )
+                        ).encode("utf8")
+                    )
+        return h.hexdigest()
+
+    @staticmethod
+    def _render_key(spec, data_digest):
+        """The RenderCache key of a render_all job: its data, kwargs, engine and library versions."""
+        parts = [
+            version,
+            matplotlib.__version__,
+            np.__version__,
+            spec["kind"],
+            spec["by"],
+            spec["engine"],
+            os.path.splitext(spec["save_path"])[1],
+            repr(sorted((spec.get("kwargs") or {}).items())),
+        ]
+        if spec["engine"] == "tikz":
+            from importlib.metadata import PackageNotFoundError
+            from importlib.metadata import version as package_version
+
+            try:
+                parts.append(package_version("tikzplotlib"))
+            except PackageNotFoundError:
+                parts.append(None)
+        if spec.get("plot_spec") is not None:
+            parts.append(
+                json.dumps(spec["plot_spec"].to_dict(), sort_keys=True, default=repr)
+            )
+        else:
+            parts.append(data_digest)
+        return RenderCache.key(*parts)
+
+    def render_all(self, plots, n_jobs=None, save_dir=None, cache=None):
+        """
+        Render many plots in parallel processes, each plot on its own figure.
+        The data is shipped to the workers once: they are forked from this process where
+        possible, otherwise the visualizer is sent once to each worker.
+        :param plots: the plot specs, dicts of kind (box, violin, pie, scatter, trajectory, bar,
+            a12_bar, sk_rank or cd), by, engine, save_path and kwargs (passed to the plot),
+            only kind is required. A PlotSpec (see plot_spec()), or a dict with a PlotSpec
+            as plot_spec, is only drawn by the workers: its statistics are not recomputed.
+        :param n_jobs: the number of processes, None or -1 for all cores, 1 to render here
+        :param save_dir: the directory of the plots without a save_path,
+            saved as "<name>.<kind>_plot_by_<by>.png" (or .tex), the current directory by default
+        :param cache: a RenderCache, or the directory of one, to copy the plots of unchanged
+            data and kwargs from instead of rendering them again, None to render every plot
+
+        :return: a list of {kind, by, save_path, time, error, cached} dicts in the order of the
+            plots, error is the traceback of a failed plot, otherwise None
+        """
+        jobs = []
+        for spec in plots:
+            if isinstance(spec, PlotSpec):
+                spec = {"plot_spec": spec}
+            spec = dict(spec)
+            if spec.get("plot_spec") is not None:
+                spec.setdefault("kind", spec["plot_spec"].kind)
+                spec.setdefault("by", spec["plot_spec"].by)
+            if spec.get("kind") not in self.PLOT_KINDS:
+                raise NotImplementedError(
+                    "Plot kind {} not implemented, choose from {}".format(
+                        spec.get("kind"), list(self.PLOT_KINDS)
+                    )
+                )
+            spec.setdefault("by", "trial")
+            spec.setdefault("engine", "matplotlib")
+            if not spec.get("save_path"):
+                spec["save_path"] = os.path.join(
+                    save_dir or os.getcwd(),
+                    "{}.{}_plot_by_{}.{}".format(
+                        self.name,
+                        spec["kind"],
+                        spec["by"],
+                        {"tikz": "tex", "svg": "svg"}.get(spec["engine"], "png"),
+                    ),
+                )
+            os.makedirs(
+                os.path.dirname(os.path.abspath(spec["save_path"])), exist_ok=True
+            )
+            jobs.append(spec)
+
+        results = [None] * len(jobs)
+        keys = [None] * len(jobs)
+        if cache is not None:
+            if not isinstance(cache, RenderCache):
+                cache = RenderCache(cache)
+            data_digest = self._data_digest()
+            for i, spec in enumerate(jobs):
+                start = time.perf_counter()
+                keys[i] = self._render_key(spec, data_digest)
+                if cache.fetch(keys[i], spec["save_path"]):
+                    results[i] = {
+                        "kind": spec["kind"],
+                        "by": spec["by"],
+                        "save_path": spec["save_path"],
+                        "time": time.perf_counter() - start,
+                        "error": None,
+                        "cached": True,
+                    }
+                else:
+                    cache.release(spec["save_path"])
+        todo = [i for i, result in enumerate(results) if result is None]
+
+        for i, result in zip(todo, self._render_jobs([jobs[i] for i in todo], n_jobs)):
+            results[i] = result
+            if cache is not None and result["error"] is None:
+                cache.store(keys[i], result["save_path"])
+        if cache is not None:
+            cache.flush()
+        return results
+
+    def _render_jobs(self, jobs, n_jobs):
+        if not jobs:
+            return []
+        if n_jobs is None or n_jobs < 0:
+            n_jobs = os.cpu_count()
+        n_jobs = min(n_jobs, len(jobs))
+        if all(spec.get("plot_spec") is not None for spec in jobs):
+            # the specs carry all the workers need, the data is not shipped at all
+            mv = None
+        else:
+            mv = self
+        if n_jobs <= 1:
+            return [_render_job(spec, mv) for spec in jobs]
+
+        if "fork" in multiprocessing.get_all_start_methods():
+            # the forked workers share the data of this process
+            _init_render_worker(mv)
+            try:
+                with multiprocessing.get_context("fork").Pool(n_jobs) as pool:
+                    return pool.map(_render_job, jobs, chunksize=1)
+            finally:
+                _init_render_worker(None)
+        with multiprocessing.Pool(
+            n_jobs, initializer=_init_render_worker, initargs=(mv,)
+        ) as pool:
+            return pool.map(_render_job, jobs, chunksize=1)
+
+    def remove_outliers(self, outlier_constant=1.5, method="median"):
         """Remove outliers from the data.
 
+        The quartiles of all (metric, trial) cells are computed in one pass over
+        the concatenated values, and values outside
+        [Q1 - outlier_constant * IQR, Q3 + outlier_constant * IQR] are outliers.
+        The cells sampled by a ReservoirMetricList are left as they are, their
+        exact aggregates cover values that are no longer kept.
+
         Args:
             outlier_constant (float, optional): The constant used to calculate the
                 upper and lower bounds. Defaults to 1.5.
+            method (str, optional): "median" replaces outliers with the median of the
+                remaining values of the cell, "drop" removes them and "winsorize" clips
+                them to the smallest / largest remaining values. Defaults to "median".
+
+        Returns:
+            dict: the number of outliers of each cell, as {metric: {trial: count}},
+                without the sampled cells
         """
-        for metric_name, metric_data in self.metrics.items():
-            for trial_name, trial_data in metric_data.items():
-                data = pd.DataFrame(trial_data)
-                a = data.quantile(0.75)
-                b = data.quantile(0.25)
-                c = data
-                c[(c >= (a - b) * 1.5 + a) | (c <= b - (a - b) * outlier_constant)] = (
-                    np.nan
-                )
-                c.fillna(c.median(), inplace=True)
-                self.metrics[metric_name][trial_name] = MetricList(
-                    [x[0] for x in c.values.tolist()]
-                )
+        assert method in ["median", "drop", "winsorize"]
+        cells = [
+            (metric_name, trial_name)
+            for metric_name, metric_data in self.metrics.items()
+            for trial_name, trial_data in metric_data.items()
+            if not isinstance(trial_data, ReservoirMetricList)
+        ]
+        if not cells:
+            return {}
+        lengths = np.array([len(self.metrics[m][t]) for m, t in cells])
+        values = np.concatenate(
+            [np.asarray(self.metrics[m][t].data, dtype=float) for m, t in cells]
+        )
+        segments = np.repeat(np.arange(len(cells)), lengths)
+
+        q1, q3 = segmented_percentile(values, lengths, [25, 75])
+        iqr = q3 - q1
+        lower = (q1 - iqr * outlier_constant)[segments]
+        upper = (q3 + iqr * outlier_constant)[segments]
+        outliers = (values < lower) | (values > upper)
+
+        counts = np.bincount(segments[outliers], minlength=len(cells))
+
+        kept = np.where(outliers, np.nan, values)
+        if method == "median":
+            median = segmented_percentile(kept, lengths, 50)
+            values[outliers] = median[segments][outliers]
+        elif method == "winsorize":
+            low, high = segmented_percentile(kept, lengths, [0, 100])
+            values = np.clip(values, low[segments], high[segments])
+        else:
+            values = values[~outliers]
+            lengths = lengths - counts
+
+        report = OrderedDict()
+        for (metric_name, trial_name), cell_values, count in zip(
+            cells, np.split(values, np.cumsum(lengths)[:-1]), counts.tolist()
+        ):
+            self.metrics[metric_name][trial_name] = MetricList(cell_values.tolist())
+            report.setdefault(metric_name, OrderedDict())[trial_name] = count
+        self._touch()
+        return report
 
     def transpose(self):
         transposed_metrics = OrderedDict()
@@ -1334,6 +1483,15 @@ class MetricVisualizer:
                 ][trial_tag_list]
         return transposed_metrics
 
+    @staticmethod
+    def _ranksums(x, y, alternative="two-sided"):
+        return stat_test_cache.get_or_compute(
+            "ranksums",
+            (x, y),
+            lambda: ranksums(x, y, alternative),
+            alternative=alternative,
+        )
+
     def _rank_test_by_trial(self, **kwargs):
         transposed_metrics = self.transpose()
         for trial in transposed_metrics.keys():
@@ -1341,7 +1499,7 @@ class MetricVisualizer:
             for metric1 in transposed_metrics[trial].keys():
                 for metric2 in transposed_metrics[trial].keys():
                     if metric1 != metric2:
-                        result = ranksums(
+                        result = self._ranksums(
                             transposed_metrics[trial][metric1],
                             transposed_metrics[trial][metric2],
                             kwargs.get("rank_type", "two-sided"),
@@ -1366,7 +1524,7 @@ class MetricVisualizer:
             for trial1 in trial_tag_list:
                 for trial2 in trial_tag_list:
                     if trial1 != trial2:
-                        result = ranksums(
+                        result = self._ranksums(
                             self.metrics[metric][trial1],
                             self.metrics[metric][trial2],
                             kwargs.get("rank_type", "two-sided"),
@@ -1383,70 +1541,175 @@ class MetricVisualizer:
         except KeyError:
             return self.metric_rank_test_result
 
-    def _get_raw_table_data(self, **kwargs):
-        use_round = kwargs.get("round", None)
-        table_data = []
-        if kwargs.get("transpose", False):
-            header = [
-                "Trial",
-                "Metric",
-                "Values",
-                "Average",
-                "Median",
-                "Std",
-                "IQR",
-                "Min",
-                "Max",
+    def _effect_size_by_metric(self):
+        from metric_visualizer.external import cliffsDeltaMatrix
+
+        self.metric_effect_size_result = {}
+        for metric in self.metrics.keys():
+            trials = list(self.metrics[metric].keys())
+            self.metric_effect_size_result[metric] = pd.DataFrame(
+                cliffsDeltaMatrix(list(self.metrics[metric].values())),
+                index=trials,
+                columns=trials,
+            )
+        return self.metric_effect_size_result
+
+    def effect_size_by_metric(self, metric=None):
+        """Cliff's delta between every pair of trials of each metric.
+        :param metric: the metric to return, or None for all metrics
+
+        :return: a trial x trial DataFrame (or a dict of them by metric), where
+            the cell (trial1, trial2) is the delta of trial1 against trial2
+        """
+        self._effect_size_by_metric()
+        try:
+            return self.metric_effect_size_result[metric]
+        except KeyError:
+            return self.metric_effect_size_result
+
+    def friedman_test(self, larger_is_better=True, alpha=0.05):
+        """
+        Friedman test of the trials over all metrics, with the Nemenyi critical difference.
+        Each metric is a block: the trial averages of all metrics are ranked in one pass,
+        so k trials over m metrics cost O(k*m*log(k)) instead of k^2 pairwise tests per metric.
+        Metrics not logged for every trial are left out.
+        :param larger_is_better: whether a larger metric value ranks first, a bool or a {metric: bool} dict
+        :param alpha: the significance level of the critical difference
+
+        :return: a dict of the rank matrix, average ranks, test statistics and critical difference
+        """
+        from scipy.stats import chi2, f, rankdata, studentized_range
+
+        trials = list(self.transpose().keys())
+        metrics = [
+            metric
+            for metric in self.metrics
+            if all(trial in self.metrics[metric] for trial in trials)
+        ]
+        if len(trials) < 2 or not metrics:
+            raise ValueError(
+                "The Friedman test needs at least 2 trials logged for the same metrics."
+            )
+        scores = np.array(
+            [
+                [self.metrics[metric][trial].avg for metric in metrics]
+                for trial in trials
+            ]
+        )
+        if isinstance(larger_is_better, dict):
+            sign = np.array(
+                [1 if larger_is_better.get(m, True) else -1 for m in metrics]
+            )
+        else:
+            sign = 1 if larger_is_better else -1
+        ranks = rankdata(-sign * scores, axis=0)
+
+        k, m = ranks.shape
+        avg_ranks = ranks.mean(axis=1)
+        statistic = (
+            12 * m / (k * (k + 1)) * (np.sum(avg_ranks**2) - k * (k + 1) ** 2 / 4)
+        )
+        denominator = m * (k - 1) - statistic
+        iman_davenport = (
+            (m - 1) * statistic / denominator if denominator > 0 else np.inf
+        )
+        q_alpha = studentized_range.ppf(1 - alpha, k, np.inf) / np.sqrt(2)
+
+        return {
+            "rank_matrix": pd.DataFrame(ranks, index=trials, columns=metrics),
+            "average_ranks": pd.Series(avg_ranks, index=trials).sort_values(),
+            "statistic": statistic,
+            "pvalue": chi2.sf(statistic, k - 1),
+            "iman_davenport": iman_davenport,
+            "iman_davenport_pvalue": f.sf(iman_davenport, k - 1, (k - 1) * (m - 1)),
+            "critical_difference": q_alpha * np.sqrt(k * (k + 1) / (6 * m)),
+            "alpha": alpha,
+        }
+
+    def _touch(self):
+        """Mark the metric dict as changed, so the cached stats table is rebuilt."""
+        self._version = getattr(self, "_version", 0) + 1
+
+    @staticmethod
+    def _refresh_cells(cache, cells, compute):
+        """Recompute the cached results of the cells changed since the last call.
+
+        A cell is dirty if it is not cached, was replaced by another object, or its
+        MetricList.version changed. The cache holds the cell itself, so a cached
+        cell can't be mistaken for a new one.
+
+        :param cache: {(metric, trial): (cell, version, result)}, updated in place
+            and pruned to the given cells
+        :param cells: the (metric, trial, cell) of the table
+        :param compute: computes the results of a list of cells at once
+        :return: True if any cell was dirty or pruned
+        """
+        dirty = [
+            (metric, trial, cell)
+            for metric, trial, cell in cells
+            if (metric, trial) not in cache
+            or cache[(metric, trial)][0] is not cell
+            or cache[(metric, trial)][1] != getattr(cell, "version", None)
+        ]
+        if dirty:
+            results = compute([cell for _, _, cell in dirty])
+            for (metric, trial, cell), result in zip(dirty, results):
+                cache[(metric, trial)] = (cell, getattr(cell, "version", None), result)
+        stale = len(cache) != len(cells)
+        if stale:
+            keys = set((metric, trial) for metric, trial, _ in cells)
+            for key in [key for key in cache if key not in keys]:
+                cache.pop(key)
+        return bool(dirty) or stale
+
+    @staticmethod
+    def _compute_raw_stats(cells):
+        segments = cell_segments(cells)
+        columns = [
+            compute_stat(name, cells, kind, segments)
+            for name, kind in [
+                ("average", "central"),
+                ("median", "central"),
+                ("std", "dispersion"),
+                ("iqr", "dispersion"),
+                ("min", "central"),
+                ("max", "central"),
             ]
-            transposed_metrics = self.transpose()
-            for i, trial in enumerate(transposed_metrics.keys()):
-                trials = transposed_metrics[trial]
-                for j, metric in enumerate(trials.keys()):
-                    _data = []
-                    _data += [
-                        [
-                            trial,
-                            metric,
-                            [
-                                round(x, use_round) if use_round else x
-                                for x in trials[metric][:10]
-                            ],
-                        ]
-                    ]
-                    _data[-1].append(
-                        round(trials[metric].avg, use_round)
-                        if use_round
-                        else trials[metric].avg
-                    )
-                    _data[-1].append(
-                        round(trials[metric].median, use_round)
-                        if use_round
-                        else trials[metric].median
-                    )
-                    _data[-1].append(
-                        round(trials[metric].std, use_round)
-                        if use_round
-                        else trials[metric].std
-                    )
-                    _data[-1].append(
-                        round(trials[metric].iqr, use_round)
-                        if use_round
-                        else trials[metric].iqr
-                    )
-                    _data[-1].append(
-                        round(trials[metric].min, use_round)
-                        if use_round
-                        else trials[metric].min
-                    )
-                    _data[-1].append(
-                        round(trials[metric].max, use_round)
-                        if use_round
-                        else trials[metric].max
-                    )
-                    table_data += _data
+        ]
+        return [
+            [np.asarray(cell[:10]).tolist()] + row
+            for cell, row in zip(cells, np.array(columns).T.tolist())
+        ]
 
-        else:
-            header = [
+    def stats_table(self):
+        """Get the per-cell statistics of all (metric, trial) cells as a DataFrame.
+
+        The columns are Metric, Trial, Values (the first 10 values), Average, Median,
+        Std, IQR, Min and Max, the statistics computed by metric_visualizer.stat_registry.
+        The statistics of each cell are cached, and only the cells changed since the
+        last call (see _refresh_cells) are recomputed, all at once. The DataFrame is
+        rebuilt only if a cell changed or the version counter of the visualizer moved.
+
+        :return: the cached DataFrame, do not modify it in place
+        """
+        cells = [
+            (metric, trial, cell)
+            for metric, trial_data in self.metrics.items()
+            for trial, cell in trial_data.items()
+        ]
+        cache = self.__dict__.setdefault("_cell_stats", {})
+        changed = self._refresh_cells(cache, cells, self._compute_raw_stats)
+        version = getattr(self, "_version", 0)
+        if (
+            not changed
+            and getattr(self, "_stats_table_version", None) == version
+            and getattr(self, "_stats_table", None) is not None
+        ):
+            return self._stats_table
+
+        self._stats_table = pd.DataFrame(
+            [[metric, trial] + cache[(metric, trial)][2] for metric, trial, _ in cells],
+            columns=[
                 "Metric",
                 "Trial",
                 "Values",
@@ -1456,338 +1719,89 @@ class MetricVisualizer:
                 "IQR",
                 "Min",
                 "Max",
+            ],
+        )
+        self._stats_table_version = version
+        return self._stats_table
+
+    def _get_raw_table_frame(self, **kwargs):
+        """Format the cached stats table for the raw summary and the raw exports.
+
+        :param kwargs: round, transpose, and max_values, the number of raw values
+            shown per cell (10 by default, None for all of them)
+        """
+        use_round = kwargs.get("round", None)
+        max_values = kwargs.get("max_values", 10)
+        df = self.stats_table().copy()
+        if max_values != 10:
+            df["Values"] = [
+                np.asarray(cell[:max_values]).tolist()
+                for trial_data in self.metrics.values()
+                for cell in trial_data.values()
             ]
-            transposed_metrics = self.metrics
-            for i, metric in enumerate(transposed_metrics.keys()):
-                metrics = transposed_metrics[metric]
-                for j, trial in enumerate(metrics.keys()):
-                    _data = []
-                    _data += [
-                        [
-                            metric,
-                            trial,
-                            [
-                                round(x, use_round) if use_round else x
-                                for x in metrics[trial][:10]
-                            ],
-                        ]
-                    ]
-                    _data[-1].append(
-                        round(metrics[trial].avg, use_round)
-                        if use_round
-                        else metrics[trial].avg
-                    )
-                    _data[-1].append(
-                        round(metrics[trial].median, use_round)
-                        if use_round
-                        else metrics[trial].median
-                    )
-                    _data[-1].append(
-                        round(metrics[trial].std, use_round)
-                        if use_round
-                        else metrics[trial].std
-                    )
-                    _data[-1].append(
-                        round(metrics[trial].iqr, use_round)
-                        if use_round
-                        else metrics[trial].iqr
-                    )
-                    _data[-1].append(
-                        round(metrics[trial].min, use_round)
-                        if use_round
-                        else metrics[trial].min
-                    )
-                    _data[-1].append(
-                        round(metrics[trial].max, use_round)
-                        if use_round
-                        else metrics[trial].max
-                    )
-                    table_data += _data
+        if use_round:
+            df["Values"] = [[round(x, use_round) for x in xs] for xs in df["Values"]]
+            df = df.round(use_round)
+        if kwargs.get("transpose", False):
+            # group the rows by trial, in the order of self.transpose()
+            trial_order = {
+                trial: i for i, trial in enumerate(OrderedDict.fromkeys(df["Trial"]))
+            }
+            df = df.iloc[np.argsort(df["Trial"].map(trial_order).values, kind="stable")]
+            df = df[["Trial", "Metric"] + list(df.columns[2:])]
+        return df.reset_index(drop=True)
 
-        return table_data, header
+    def _get_raw_table_data(self, **kwargs):
+        df = self._get_raw_table_frame(**kwargs)
+        return df.values.tolist(), list(df.columns)
 
     def _get_processed_table_data(self, method="average", stat="std", **kwargs):
+        """
+        :param method: the central value, any central statistic of metric_visualizer.stat_registry,
+            such as average, median, min, max, trimmed_mean
+        :param stat: the dispersion, any dispersion statistic of metric_visualizer.stat_registry,
+            such as std, iqr, skewness, kurtosis, mad, percentile, or ci for a bootstrap
+            confidence interval of the central value (see metric_visualizer.utils.bootstrap_ci)
+        """
         use_round = kwargs.get("round", None)
-        assert method in ["average", "median", "min", "max"]
-        assert stat in ["std", "iqr", "skewness", "kurtosis"]
-        table_data = []
+        kwargs = {k: v for k, v in kwargs.items() if k != "method"}
+
+        def _compute(cells):
+            segments = cell_segments(cells)
+            centers = compute_stat(method, cells, "central", segments, **kwargs)
+            dispersions = compute_stat(
+                stat, cells, "dispersion", segments, method=method, **kwargs
+            )
+            return [format_stat(c, d, use_round) for c, d in zip(centers, dispersions)]
+
+        # the formatted cells are cached per arguments, only changed cells are recomputed,
+        # and only the tables of the last few arguments are kept
+        tables = self.__dict__.setdefault("_processed_tables", OrderedDict())
+        key = (method, stat, repr(sorted(kwargs.items())))
+        cache = tables.setdefault(key, {})
+        tables.move_to_end(key)
+        while len(tables) > self.PROCESSED_TABLES_MAXSIZE:
+            tables.popitem(last=False)
 
         header = ["Trial"] + [
             "{}-{} ({})".format(method, x, stat) for x in list(self.metrics.keys())
         ]
         transposed_metrics = self.transpose()
-        for i, trial in enumerate(transposed_metrics.keys()):
-            trials = transposed_metrics[trial]
-            _data = []
-            _data.append(trial)
-            for metric in trials.keys():
-                if method == "average":
-                    if stat == "std":
-                        _data.append(
-                            "{} ({})".format(
-                                (
-                                    round(trials[metric].avg, use_round)
-                                    if use_round
-                                    else trials[metric].avg
-                                ),
-                                (
-                                    round(trials[metric].std, use_round)
-                                    if use_round
-                                    else trials[metric].std
-                                ),
-                            )
-                        )
-                    elif stat == "iqr":
-                        _data.append(
-                            "{} ({})".format(
-                                (
-                                    round(trials[metric].avg, use_round)
-                                    if use_round
-                                    else trials[metric].avg
-                                ),
-                                (
-                                    round(trials[metric].iqr, use_round)
-                                    if use_round
-                                    else trials[metric].iqr
-                                ),
-                            )
-                        )
-                    elif stat == "skewness":
-                        _data.append(
-                            "{} ({})".format(
-                                (
-                                    round(trials[metric].avg, use_round)
-                                    if use_round
-                                    else trials[metric].avg
-                                ),
-                                (
-                                    round(trials[metric].skewness, use_round)
-                                    if use_round
-                                    else trials[metric].skewness
-                                ),
-                            )
-                        )
-                    elif stat == "kurtosis":
-                        _data.append(
-                            "{} ({})".format(
-                                (
-                                    round(trials[metric].avg, use_round)
-                                    if use_round
-                                    else trials[metric].avg
-                                ),
-                                (
-                                    round(trials[metric].kurtosis, use_round)
-                                    if use_round
-                                    else trials[metric].kurtosis
-                                ),
-                            )
-                        )
-                    else:
-                        raise NotImplementedError(
-                            "stat {} not implemented".format(stat)
-                        )
-                elif method == "median":
-                    if stat == "std":
-                        _data.append(
-                            "{} ({})".format(
-                                (
-                                    round(trials[metric].median, use_round)
-                                    if use_round
-                                    else trials[metric].median
-                                ),
-                                (
-                                    round(trials[metric].std, use_round)
-                                    if use_round
-                                    else trials[metric].std
-                                ),
-                            )
-                        )
-                    elif stat == "iqr":
-                        _data.append(
-                            "{} ({})".format(
-                                (
-                                    round(trials[metric].median, use_round)
-                                    if use_round
-                                    else trials[metric].median
-                                ),
-                                (
-                                    round(trials[metric].iqr, use_round)
-                                    if use_round
-                                    else trials[metric].iqr
-                                ),
-                            )
-                        )
-                    elif stat == "skewness":
-                        _data.append(
-                            "{} ({})".format(
-                                (
-                                    round(trials[metric].median, use_round)
-                                    if use_round
-                                    else trials[metric].median
-                                ),
-                                (
-                                    round(trials[metric].skewness, use_round)
-                                    if use_round
-                                    else trials[metric].skewness
-                                ),
-                            )
-                        )
-                    elif stat == "kurtosis":
-                        _data.append(
-                            "{} ({})".format(
-                                (
-                                    round(trials[metric].median, use_round)
-                                    if use_round
-                                    else trials[metric].median
-                                ),
-                                (
-                                    round(trials[metric].kurtosis, use_round)
-                                    if use_round
-                                    else trials[metric].kurtosis
-                                ),
-                            )
-                        )
-                    else:
-                        raise NotImplementedError(
-                            "stat {} not implemented".format(stat)
-                        )
-                elif method == "min":
-                    if stat == "std":
-                        _data.append(
-                            "{} ({})".format(
-                                (
-                                    round(trials[metric].min, use_round)
-                                    if use_round
-                                    else trials[metric].min
-                                ),
-                                (
-                                    round(trials[metric].std, use_round)
-                                    if use_round
-                                    else trials[metric].std
-                                ),
-                            )
-                        )
-                    elif stat == "iqr":
-                        _data.append(
-                            "{} ({})".format(
-                                (
-                                    round(trials[metric].min, use_round)
-                                    if use_round
-                                    else trials[metric].min
-                                ),
-                                (
-                                    round(trials[metric].iqr, use_round)
-                                    if use_round
-                                    else trials[metric].iqr
-                                ),
-                            )
-                        )
-                    elif stat == "skewness":
-                        _data.append(
-                            "{} ({})".format(
-                                (
-                                    round(trials[metric].min, use_round)
-                                    if use_round
-                                    else trials[metric].min
-                                ),
-                                (
-                                    round(trials[metric].skewness, use_round)
-                                    if use_round
-                                    else trials[metric].skewness
-                                ),
-                            )
-                        )
-                    elif stat == "kurtosis":
-                        _data.append(
-                            "{} ({})".format(
-                                (
-                                    round(trials[metric].min, use_round)
-                                    if use_round
-                                    else trials[metric].min
-                                ),
-                                (
-                                    round(trials[metric].kurtosis, use_round)
-                                    if use_round
-                                    else trials[metric].kurtosis
-                                ),
-                            )
-                        )
-                    else:
-                        raise NotImplementedError(
-                            "stat {} not implemented".format(stat)
-                        )
-                elif method == "max":
-                    if stat == "std":
-                        _data.append(
-                            "{} ({})".format(
-                                (
-                                    round(trials[metric].max, use_round)
-                                    if use_round
-                                    else trials[metric].max
-                                ),
-                                (
-                                    round(trials[metric].std, use_round)
-                                    if use_round
-                                    else trials[metric].std
-                                ),
-                            )
-                        )
-                    elif stat == "iqr":
-                        _data.append(
-                            "{} ({})".format(
-                                (
-                                    round(trials[metric].max, use_round)
-                                    if use_round
-                                    else trials[metric].max
-                                ),
-                                (
-                                    round(trials[metric].iqr, use_round)
-                                    if use_round
-                                    else trials[metric].iqr
-                                ),
-                            )
-                        )
-                    elif stat == "skewness":
-                        _data.append(
-                            "{} ({})".format(
-                                (
-                                    round(trials[metric].max, use_round)
-                                    if use_round
-                                    else trials[metric].max
-                                ),
-                                (
-                                    round(trials[metric].skewness, use_round)
-                                    if use_round
-                                    else trials[metric].skewness
-                                ),
-                            )
-                        )
-                    elif stat == "kurtosis":
-                        _data.append(
-                            "{} ({})".format(
-                                (
-                                    round(trials[metric].max, use_round)
-                                    if use_round
-                                    else trials[metric].max
-                                ),
-                                (
-                                    round(trials[metric].kurtosis, use_round)
-                                    if use_round
-                                    else trials[metric].kurtosis
-                                ),
-                            )
-                        )
-                    else:
-                        raise NotImplementedError(
-                            "stat {} not implemented".format(stat)
-                        )
-                else:
-                    raise NotImplementedError(
-                        "method {} not implemented".format(method)
-                    )
-
-            table_data.append(_data)
+        self._refresh_cells(
+            cache,
+            [
+                (metric, trial, transposed_metrics[trial][metric])
+                for trial in transposed_metrics
+                for metric in transposed_metrics[trial]
+            ],
+            _compute,
+        )
 
+        table_data = [
+            [trial]
+            + [cache[(metric, trial)][2] for metric in transposed_metrics[trial]]
+            for trial in transposed_metrics
+        ]
         return table_data, header
 
     def summary(self, save_path=None, filename=None, no_print=False, **kwargs):
@@ -1807,12 +1821,13 @@ class MetricVisualizer:
         # 确保目录存在
         os.makedirs(os.path.dirname(path), exist_ok=True)
 
-        table_data, header = self._get_raw_table_data(**kwargs)
-        df = pd.DataFrame(table_data, columns=header)
+        df = self._get_raw_table_frame(**kwargs)
 
         with pd.ExcelWriter(path, engine="xlsxwriter") as writer:
             df.to_excel(
-                writer, sheet_name=self.name[:31], index=kwargs.get("index", False)
+                writer,
+                sheet_name=self._excel_sheet_name(self.name),
+                index=kwargs.get("index", False),
             )
 
     def to_txt(self, path=None, **kwargs):
@@ -1853,8 +1868,7 @@ class MetricVisualizer:
 
         os.makedirs(os.path.dirname(path), exist_ok=True)
 
-        table_data, header = self._get_raw_table_data(**kwargs)
-        df = pd.DataFrame(table_data, columns=header)
+        df = self._get_raw_table_frame(**kwargs)
         df.to_html(path, index=kwargs.get("index", False))
 
     def to_csv(self, path=None, **kwargs):
@@ -1870,8 +1884,7 @@ class MetricVisualizer:
 
         os.makedirs(os.path.dirname(path), exist_ok=True)
 
-        table_data, header = self._get_raw_table_data(**kwargs)
-        df = pd.DataFrame(table_data, columns=header)
+        df = self._get_raw_table_frame(**kwargs)
         df.to_csv(
             path,
             index=kwargs.get("index", False),
@@ -1904,6 +1917,164 @@ class MetricVisualizer:
                 serializable_metrics, f, indent=4, cls=kwargs.get("json_encoder", None)
             )
 
+    def _iter_value_chunks(self, chunk_size=65536):
+        """Yield (metric, trial, start index, values) of every cell, chunk by chunk.
+
+        The values are converted to floats chunk by chunk, so only one chunk is held in memory.
+        """
+        for metric, trial_data in self.metrics.items():
+            for trial, cell in trial_data.items():
+                data = cell.data
+                for start in range(0, len(data), chunk_size):
+                    values = np.asarray(data[start : start + chunk_size], dtype=float)
+                    yield metric, trial, start, values
+
+    @staticmethod
+    def _open_stream(path, ext, compress):
+        if path.endswith(".gz"):
+            path, compress = path[: -len(".gz")], True
+        if not path.endswith(ext):
+            path += ext
+        if compress:
+            path += ".gz"
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if compress:
+            return path, gzip.open(path, mode="wt", encoding="utf-8", compresslevel=1)
+        return path, open(path, mode="w", encoding="utf-8", newline="")
+
+    def stream_to_csv(self, path=None, chunk_size=65536, compress=False):
+        """Save all values to a csv file of long-format rows (metric, trial, index, value)
+
+        The rows are written chunk by chunk from the cells, so the memory usage is constant
+        whatever the number of values, unlike to_csv and to_json.
+
+        :param path:  the path to save the csv file, compressed if it ends with .gz
+        :param chunk_size:  the number of values converted and written at once
+        :param compress:  compress the file with gzip
+        :return:  the path of the csv file
+        """
+        if not path:
+            path = os.path.join(os.getcwd(), f"{self.name}.csv")
+        path, fout = self._open_stream(path, ".csv", compress)
+        with fout:
+            fout.write("metric,trial,index,value\n")
+            prefix = None
+            for metric, trial, start, values in self._iter_value_chunks(chunk_size):
+                if start == 0:
+                    line = io.StringIO()
+                    csv.writer(line, lineterminator="").writerow([metric, trial, ""])
+                    prefix = line.getvalue()
+                fout.write(
+                    "".join(
+                        f"{prefix}{i},{v!r}\n"
+                        for i, v in enumerate(values.tolist(), start)
+                    )
+                )
+        return path
+
+    def stream_to_jsonl(self, path=None, chunk_size=65536, compress=False):
+        """Save all values to a jsonl file, one {"metric", "trial", "index", "value"} object per line
+
+        The lines are written chunk by chunk from the cells, so the memory usage is constant
+        whatever the number of values, unlike to_json. Non-finite values are written as
+        NaN, Infinity and -Infinity, as json.dumps does.
+
+        :param path:  the path to save the jsonl file, compressed if it ends with .gz
+        :param chunk_size:  the number of values converted and written at once
+        :param compress:  compress the file with gzip
+        :return:  the path of the jsonl file
+        """
+        if not path:
+            path = os.path.join(os.getcwd(), f"{self.name}.jsonl")
+        path, fout = self._open_stream(path, ".jsonl", compress)
+        non_finite = {"nan": "NaN", "inf": "Infinity", "-inf": "-Infinity"}
+        with fout:
+            prefix = None
+            for metric, trial, start, values in self._iter_value_chunks(chunk_size):
+                if start == 0:
+                    prefix = '{{"metric": {}, "trial": {}, "index": '.format(
+                        json.dumps(metric), json.dumps(trial)
+                    )
+                strings = list(map(repr, values.tolist()))
+                if not np.isfinite(values).all():
+                    strings = [non_finite.get(v, v) for v in strings]
+                fout.write(
+                    "".join(
+                        f'{prefix}{i}, "value": {v}}}\n'
+                        for i, v in enumerate(strings, start)
+                    )
+                )
+        return path
+
+    @staticmethod
+    def _excel_sheet_name(name, used=None):
+        """Make a valid excel sheet name: no []:*?/\\ characters, at most 31 characters,
+        and unique (case-insensitively) among the used names, which is updated.
+        """
+        name = "".join("_" if c in "[]:*?/\\" else c for c in str(name))
+        name = name.strip("'")[:31] or "Sheet"
+        if used is None:
+            return name
+        candidate, i = name, 1
+        while candidate.lower() in used:
+            i += 1
+            suffix = " ({})".format(i)
+            candidate = name[: 31 - len(suffix)] + suffix
+        used.add(candidate.lower())
+        return candidate
+
+    def stream_to_excel(self, path=None, chunk_size=65536):
+        """Save all values to an excel file, one sheet per metric with a column per trial
+
+        The workbook is written in the constant memory mode of xlsxwriter, row by row and
+        chunk by chunk from the cells, so the memory usage is constant whatever the number
+        of values, unlike to_excel. The values of a metric exceeding the row limit of excel
+        continue on the next sheets, named "<metric> (2)", etc.
+
+        :param path:  the path to save the excel file
+        :param chunk_size:  the number of rows converted and written at once
+        :return:  the path of the excel file
+        """
+        import xlsxwriter
+
+        if not path:
+            path = os.path.join(os.getcwd(), f"{self.name}.xlsx")
+        elif not path.endswith(".xlsx"):
+            path += ".xlsx"
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        max_rows = 1048576 - 1  # the first row is the header
+        used = set()
+        workbook = xlsxwriter.Workbook(
+            path, {"constant_memory": True, "nan_inf_to_errors": True}
+        )
+        try:
+            for metric, trial_data in self.metrics.items():
+                cells = [cell.data for cell in trial_data.values()]
+                length = max([len(data) for data in cells], default=0)
+                for part, offset in enumerate(range(0, max(length, 1), max_rows)):
+                    worksheet = workbook.add_worksheet(
+                        self._excel_sheet_name(
+                            metric if part == 0 else "{} ({})".format(metric, part + 1),
+                            used,
+                        )
+                    )
+                    worksheet.write_row(0, 0, [str(trial) for trial in trial_data])
+                    end = min(offset + max_rows, length)
+                    for start in range(offset, end, chunk_size):
+                        stop = min(start + chunk_size, end)
+                        columns = [
+                            np.asarray(data[start:stop], dtype=float).tolist()
+                            for data in cells
+                        ]
+                        for row, values in enumerate(
+                            itertools.zip_longest(*columns), start - offset + 1
+                        ):
+                            worksheet.write_row(row, 0, values)
+        finally:
+            workbook.close()
+        return path
+
     def to_latex(self, path=None, **kwargs):
         """Save the metrics to a latex file
 
@@ -1917,8 +2088,7 @@ class MetricVisualizer:
 
         os.makedirs(os.path.dirname(path), exist_ok=True)
 
-        table_data, header = self._get_raw_table_data(**kwargs)
-        df = pd.DataFrame(table_data, columns=header)
+        df = self._get_raw_table_frame(**kwargs)
 
         with open(path, "w", encoding="utf-8") as f:
             f.write(
@@ -1929,93 +2099,94 @@ class MetricVisualizer:
                 )
             )
 
-    def raw_summary(self, save_path=None, filename=None, no_print=False, **kwargs):
-        if filename:
-            print("Warning: filename is deprecated, please use save_path instead.")
+    def _write_summary(self, table_data, header, logo, save_path, no_print, save_mv):
+        """Print and / or save a summary table line by line.
 
-        table_data, header = self._get_raw_table_data(**kwargs)
+        A saved summary is streamed to its file and never held in memory as a whole.
 
-        summary_str = tabulate(
-            table_data, headers=header, numalign="center", tablefmt="fancy_grid"
-        )
-        logo = " Raw Metric Records "
+        :return: the path of the saved summary, or the summary string if it is not saved
+        """
         url = " https://github.com/yangheng95/metric_visualizer "
-        _prefix = (
-            "\n"
-            + "-" * ((len(summary_str.split("\n")[0]) - len(logo)) // 2)
-            + logo
-            + "-" * ((len(summary_str.split("\n")[0]) - len(logo)) // 2)
-            + "\n"
-        )
-
-        _postfix = (
-            "\n"
-            + "-" * ((len(summary_str.split("\n")[0]) - len(url)) // 2)
-            + url
-            + "-" * ((len(summary_str.split("\n")[0]) - len(url)) // 2)
-            + "\n"
-        )
+        lines = grid_lines(table_data, header)
+        top = next(lines)
 
-        summary_str = _prefix + summary_str + _postfix
-        if not no_print:
-            print(summary_str)
+        def _banner(text):
+            dashes = "-" * ((len(top) - len(text)) // 2)
+            return dashes + text + dashes
 
+        fout = None
         if save_path:
             if not save_path.endswith(".summary.txt"):
                 save_path = save_path + ".summary.txt"
-
             fout = open(save_path, mode="w", encoding="utf8")
-            summary_str += "\n{}\n".format(str(self.metrics))
-            fout.write(summary_str)
-            fout.close()
 
+        summary_lines = []
+        try:
+            for line in itertools.chain(
+                ["", _banner(logo), top], lines, [_banner(url), ""]
+            ):
+                if fout:
+                    fout.write(line + "\n")
+                else:
+                    summary_lines.append(line)
+                if not no_print:
+                    print(line)
+        finally:
+            if fout:
+                fout.close()
+
+        if not save_path:
+            return "\n".join(summary_lines)
+        if save_mv:
             self.dump(save_path.replace(".summary.txt", ".mv"))
+        return save_path
 
-        return summary_str
-
-    def short_summary(self, save_path=None, filename=None, no_print=False, **kwargs):
+    def raw_summary(
+        self,
+        save_path=None,
+        filename=None,
+        no_print=False,
+        max_values=10,
+        save_mv=False,
+        **kwargs,
+    ):
+        """Print and / or save the raw metric records and their statistics
+
+        :param save_path:  the path to save the summary, as "<save_path>.summary.txt"
+        :param filename:  deprecated, use save_path
+        :param no_print:  do not print the summary
+        :param max_values:  the number of raw values shown per cell, None for all of them
+        :param save_mv:  also dump the metric visualizer to "<save_path>.mv"
+        :param kwargs:  the kwargs to pass to the _get_raw_table_data function
+        :return:  the path of the saved summary, or the summary string if save_path is None
+        """
         if filename:
             print("Warning: filename is deprecated, please use save_path instead.")
 
-        table_data, header = self._get_processed_table_data(**kwargs)
-
-        summary_str = tabulate(
-            table_data, headers=header, numalign="center", tablefmt="fancy_grid"
+        table_data, header = self._get_raw_table_data(max_values=max_values, **kwargs)
+        return self._write_summary(
+            table_data, header, " Raw Metric Records ", save_path, no_print, save_mv
         )
-        logo = " Metrics Table "
-        url = " https://github.com/yangheng95/metric_visualizer "
-        _prefix = (
-            "\n"
-            + "-" * ((len(summary_str.split("\n")[0]) - len(logo)) // 2)
-            + logo
-            + "-" * ((len(summary_str.split("\n")[0]) - len(logo)) // 2)
-            + "\n"
-        )
-
-        _postfix = (
-            "\n"
-            + "-" * ((len(summary_str.split("\n")[0]) - len(url)) // 2)
-            + url
-            + "-" * ((len(summary_str.split("\n")[0]) - len(url)) // 2)
-            + "\n"
-        )
-
-        summary_str = _prefix + summary_str + _postfix
-        if not no_print:
-            print(summary_str)
-
-        if save_path:
-            if not save_path.endswith(".summary.txt"):
-                save_path = save_path + ".summary.txt"
-
-            fout = open(save_path, mode="w", encoding="utf8")
-            summary_str += "\n{}\n".format(str(self.metrics))
-            fout.write(summary_str)
-            fout.close()
 
-            self.dump(save_path.replace(".summary.txt", ".mv"))
+    def short_summary(
+        self, save_path=None, filename=None, no_print=False, save_mv=False, **kwargs
+    ):
+        """Print and / or save the processed metrics table
+
+        :param save_path:  the path to save the summary, as "<save_path>.summary.txt"
+        :param filename:  deprecated, use save_path
+        :param no_print:  do not print the summary
+        :param save_mv:  also dump the metric visualizer to "<save_path>.mv"
+        :param kwargs:  the kwargs to pass to the _get_processed_table_data function
+        :return:  the path of the saved summary, or the summary string if save_path is None
+        """
+        if filename:
+            print("Warning: filename is deprecated, please use save_path instead.")
 
-        return summary_str
+        table_data, header = self._get_processed_table_data(**kwargs)
+        return self._write_summary(
+            table_data, header, " Metrics Table ", save_path, no_print, save_mv
+        )
 
     def short_to_excel(self, path=None, **kwargs):
         """Save the metrics to an excel file
@@ -2029,12 +2200,11 @@ class MetricVisualizer:
         if not path.endswith(".xlsx"):
             path = path + ".xlsx"
 
-        writer = pd.ExcelWriter(path, engine="xlsxwriter")
         table_data, header = self._get_processed_table_data(**kwargs)
 
         df = pd.DataFrame(table_data, columns=header)
-        df.to_excel(writer, sheet_name=self.name)
-        writer._save()
+        with pd.ExcelWriter(path, engine="xlsxwriter") as writer:
+            df.to_excel(writer, sheet_name=self._excel_sheet_name(self.name))
 
     def short_to_txt(self, path=None, **kwargs):
         """Save the metrics to a txt file
@@ -2111,12 +2281,74 @@ class MetricVisualizer:
         df = pd.DataFrame(table_data, columns=header)
         df.to_latex(path, index=kwargs.get("index", False))
 
+    def export_all(
+        self, save_dir=None, formats=None, short=False, n_jobs=None, **kwargs
+    ):
+        """Export the metrics to several formats at once
+
+        The tables are computed once and shared by all the writers, which run in a
+        thread pool as they are I/O-bound.
+
+        :param save_dir:  the directory to save the files, named after self.name
+        :param formats:  any of xlsx, csv, tex, html, json, txt, summary (the
+            .summary.txt file) and mv (the dump of the visualizer), all of them by default
+        :param short:  export the processed table (as short_summary) instead of the raw one
+        :param n_jobs:  the number of writer threads, defaults to one per format
+        :param kwargs:  the kwargs to pass to the writers, such as round, method, stat
+        :return:  the path and the writing time (in seconds) of each format
+        """
+        writers = OrderedDict(
+            [
+                ("xlsx", self.short_to_excel if short else self.to_excel),
+                ("csv", self.short_to_csv if short else self.to_csv),
+                ("tex", self.short_to_latex if short else self.to_latex),
+                ("html", self.short_to_html if short else self.to_html),
+                ("json", self.short_to_json if short else self.to_json),
+                ("txt", self.short_to_txt if short else self.to_txt),
+                ("summary", self.short_summary if short else self.raw_summary),
+                ("mv", self.dump),
+            ]
+        )
+        if formats is None:
+            formats = list(writers)
+        for fmt in formats:
+            if fmt not in writers:
+                raise NotImplementedError("Format {} not implemented".format(fmt))
+
+        if not save_dir:
+            save_dir = os.getcwd()
+        os.makedirs(save_dir, exist_ok=True)
+        path = os.path.join(save_dir, self.name)
+
+        # compute the shared table before the writers start
+        if short:
+            self._get_processed_table_data(**kwargs)
+        else:
+            self.stats_table()
+
+        def _write(fmt):
+            start = time.perf_counter()
+            if fmt == "summary":
+                writers[fmt](save_path=path, no_print=True, **kwargs)
+                file_path = path + ".summary.txt"
+            elif fmt == "mv":
+                writers[fmt](path)
+                file_path = path + ".mv"
+            else:
+                writers[fmt](path, **kwargs)
+                file_path = path + "." + fmt
+            return fmt, {"path": file_path, "time": time.perf_counter() - start}
+
+        with ThreadPoolExecutor(max_workers=n_jobs or len(formats) or 1) as pool:
+            return OrderedDict(pool.map(_write, formats))
+
     def drop(self, *, metric=None, trial=None):
         if metric:
             self.metrics.pop(metric)
         if trial:
             for metric in self.metrics.keys():
                 self.metrics[metric].pop(trial)
+        self._touch()
 
     def fillna(self, value=0):
         for metric in self.metrics.keys():
@@ -2124,11 +2356,13 @@ class MetricVisualizer:
                 for i, x in enumerate(self.metrics[metric][trial]):
                     if x == np.nan or x == np.inf or x == -np.inf or x is None:
                         self.metrics[metric][trial] = value
+        self._touch()
 
-    def dump(self, filename=None):
+    def dump(self, filename=None, save_cache=False):
         """Dump the metric visualizer to a file
 
         :param filename:  the file name (or path) to dump the metric visualizer
+        :param save_cache:  also save the cached statistical test results to "<filename>.cache"
         :return:
         """
         t = datetime.datetime.now().strftime("%Y-%m-%d-%H-%M-%S")
@@ -2138,6 +2372,8 @@ class MetricVisualizer:
             filename = filename + ".mv"
         with open(filename, mode="wb") as fout:
             pickle.dump(self, fout)
+        if save_cache:
+            stat_test_cache.save(filename + ".cache")
 
     @staticmethod
     def load(filename=None) -> "MetricVisualizer":
@@ -2150,7 +2386,8 @@ class MetricVisualizer:
         mv = None
 
         if not filename:
-            filenames = find_cwd_files(".mv")
+            # skip the "<name>.mv.cache" files of dump(save_cache=True)
+            filenames = find_cwd_files(".mv", exclude_key=".cache")
         elif isinstance(filename, str):
             filenames = [filename]
         elif isinstance(filename, list):
@@ -2160,7 +2397,7 @@ class MetricVisualizer:
 
         for fn in filenames:
             if not os.path.exists(fn):
-                fn = find_cwd_files([fn, ".mv"])
+                fn = find_cwd_files([fn, ".mv"], exclude_key=".cache")
 
             print("Load", fn)
             if not mv:
@@ -2173,9 +2410,12 @@ class MetricVisualizer:
                     if metric_name not in mv.metrics:
                         mv.metrics[metric_name] = {}
                     mv.metrics[metric_name].update(_.metrics[metric_name])
+                mv._touch()
+            stat_test_cache.load(fn + ".cache")
         return mv
 
     def pop(self, metric_or_trial_name):
+        self._touch()
         if metric_or_trial_name in self.metrics:
             return self.metrics.pop(metric_or_trial_name)
         else:
@@ -2188,3 +2428,69 @@ class MetricVisualizer:
 
     def __setitem__(self, key, value):
         self.metrics[key] = value
+        self._touch()
+
+    def __getstate__(self):
+        # the caches are rebuilt on demand, no need to pickle them
+        state = self.__dict__.copy()
+        for key in [
+            "_cell_stats",
+            "_stats_table",
+            "_stats_table_version",
+            "_processed_tables",
+            "_live",
+        ]:
+            state.pop(key, None)
+        return state
+
+
+# the MetricVisualizer rendered by the render_all workers
+_render_mv = None
+
+
+def _init_render_worker(mv):
+    global _render_mv
+    _render_mv = mv
+
+
+def _render_job(spec, mv=None):
+    """Render one plot spec of MetricVisualizer.render_all, catching its failure.
+
+    The in-process path passes ``mv``, the worker processes fall back to the
+    MetricVisualizer set by _init_render_worker.
+    """
+    if mv is None:
+        mv = _render_mv
+    result = {
+        "kind": spec["kind"],
+        "by": spec["by"],
+        "save_path": spec["save_path"],
+        "time": 0.0,
+        "error": None,
+        "cached": False,
+    }
+    kwargs = dict(spec.get("kwargs") or {})
+    if spec.get("plot_spec") is None and spec["kind"] not in [
+        "a12_bar",
+        "sk_rank",
+        "cd",
+    ]:
+        kwargs["by"] = spec["by"]
+    start = time.perf_counter()
+    try:
+        if spec.get("plot_spec") is not None:
+            MetricVisualizer.render_plot_spec(
+                spec["plot_spec"],
+                engine=spec["engine"],
+                save_path=spec["save_path"],
+                show=False,
+                **kwargs,
+            )
+        else:
+            getattr(mv, MetricVisualizer.PLOT_KINDS[spec["kind"]])(
+                engine=spec["engine"], save_path=spec["save_path"], show=False, **kwargs
+            )
+    except Exception:
+        result["error"] = traceback.format_exc()
+    result["time"] = time.perf_counter() - start
+    return result
@@ -0,0 +1,536 @@
+# -*- coding: utf-8 -*-
+# file: plot_spec.py
+# time: 11:05 2026/10/19
+# author: yangheng <hy345@exeter.ac.uk>
+# github: https://github.com/yangheng95
+# huggingface: https://huggingface.co/yangheng
+# google scholar: https://scholar.google.com/citations?user=NPq5a_0AAAAJ&hl=en
+# Copyright (C) 2021. All Rights Reserved.
+import random
+
+import matplotlib
+import numpy as np
+from matplotlib import cbook, mlab
+from matplotlib.artist import setp
+from matplotlib.colors import to_hex
+
+from metric_visualizer.stat_registry import compute_stat
+from metric_visualizer.utils import MetricList
+
+SPEC_KINDS = ["box", "violin", "scatter", "trajectory", "bar"]
+
+
+class PlotSpec:
+    """What to draw for one plot, with every statistic already computed.
+
+    A spec holds the series (label, color and the box stats, KDE grids, points or bars
+    of each metric), the x ticks, the axis labels and the styling options as plain Python
+    values: it pickles small, compares with ==, and is drawn by draw_plot_spec() on any
+    matplotlib Axes, so the same spec is rendered to png, svg or tikz without touching
+    the data again.
+    """
+
+    def __init__(
+        self,
+        kind,
+        series,
+        xticks,
+        xticklabels,
+        xlabel="Trial Name",
+        ylabel="Metric Value",
+        by="trial",
+        options=None,
+    ):
+        """
+        :param kind: the kind of plot, one of SPEC_KINDS
+        :param series: a list of dicts, one per legend entry, with the label, color and the
+            kind-specific data (see the _build_* functions)
+        :param xticks: the positions of the x ticks
+        :param xticklabels: the labels of the x ticks
+        :param xlabel: the label of the x-axis
+        :param ylabel: the label of the y-axis
+        :param by: the grouping of the x-axis, such as trial, metric, etc.
+        :param options: the styling options, such as legend, legend_loc, grid, xrotation, etc.
+        """
+        self.kind = kind
+        self.series = series
+        self.xticks = xticks
+        self.xticklabels = xticklabels
+        self.xlabel = xlabel
+        self.ylabel = ylabel
+        self.by = by
+        self.options = options or {}
+
+    def to_dict(self):
+        return {
+            "kind": self.kind,
+            "series": self.series,
+            "xticks": self.xticks,
+            "xticklabels": self.xticklabels,
+            "xlabel": self.xlabel,
+            "ylabel": self.ylabel,
+            "by": self.by,
+            "options": self.options,
+        }
+
+    @classmethod
+    def from_dict(cls, spec):
+        return cls(**spec)
+
+    def __eq__(self, other):
+        return isinstance(other, PlotSpec) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return "PlotSpec(kind={!r}, by={!r}, series={})".format(
+            self.kind, self.by, [s["label"] for s in self.series]
+        )
+
+
+def _floats(values):
+    return np.asarray(values, dtype=float).tolist()
+
+
+def _layout(plot_metrics):
+    metric_names = list(plot_metrics.keys())
+    trial_names = list(plot_metrics[metric_names[0]].keys())
+    return metric_names, trial_names
+
+
+def _require_values(plot_metrics, kind):
+    # the cells of reservoir_size=0 keep aggregates only
+    for metric_name, trial_data in plot_metrics.items():
+        for trial_name, values in trial_data.items():
+            if not len(values):
+                raise ValueError(
+                    "The {} plot needs the values of every cell, but ({}, {}) keeps "
+                    "none (reservoir_size=0?)".format(kind, metric_name, trial_name)
+                )
+
+
+def _kde_method(bw_method):
+    # the same estimate as Axes.violinplot
+    def _kde(values, coords):
+        values = np.asarray(values, dtype=float)
+        if np.all(values[0] == values):
+            return (values[0] == coords).astype(float)
+        return mlab.GaussianKDE(values, bw_method).evaluate(coords)
+
+    return _kde
+
+
+def _build_box(plot_metrics, kwargs):
+    metric_names, trial_names = _layout(plot_metrics)
+    no_overlap = kwargs.pop("no_overlap", True)
+    width = kwargs.pop("widths", 0.9)
+    width = width / len(metric_names) if no_overlap else width
+    xticks = (
+        np.arange(len(trial_names)) + width * len(metric_names)
+        if no_overlap
+        else np.arange(len(trial_names)) + width / 2
+    )
+    colors = matplotlib.colormaps["jet"](np.linspace(0, 1, len(metric_names)))
+
+    # the statistic options of Axes.boxplot are applied here, the rest go to Axes.bxp
+    boxplot_kwargs = dict(kwargs.pop("boxplot_kwargs", {}))
+    box_kwargs = {
+        "whis": boxplot_kwargs.pop("whis", 1.5),
+        "max_fliers": boxplot_kwargs.pop("max_fliers", 100),
+        "bootstrap": boxplot_kwargs.pop("bootstrap", None),
+        "autorange": boxplot_kwargs.pop("autorange", False),
+    }
+    if "notch" in boxplot_kwargs:
+        boxplot_kwargs["shownotches"] = boxplot_kwargs.pop("notch")
+    kwargs["boxplot_kwargs"] = boxplot_kwargs
+
+    series = []
+    for i, metric_name in enumerate(metric_names):
+        stats = []
+        for trial_name, values in plot_metrics[metric_name].items():
+            if not isinstance(values, MetricList):
+                values = MetricList(values)
+            # computed once per cell, from the cached (or sketched) quartiles
+            box = values.box_stats(**box_kwargs)
+            stats.append(
+                {
+                    key: list(value) if key == "fliers" else float(value)
+                    for key, value in box.items()
+                }
+            )
+            stats[-1]["label"] = str(trial_name)
+        series.append(
+            {
+                "label": metric_name,
+                "color": to_hex(colors[i]),
+                "positions": _floats(xticks + i * width if no_overlap else xticks),
+                "width": width * 0.9,
+                "stats": stats,
+            }
+        )
+    default_xticks = (
+        xticks + (len(metric_names) - 1) / 2 * width if no_overlap else xticks
+    )
+    return series, default_xticks, trial_names
+
+
+def _build_violin(plot_metrics, kwargs):
+    _require_values(plot_metrics, "violin")
+    metric_names, trial_names = _layout(plot_metrics)
+    no_overlap = kwargs.pop("no_overlap", True)
+    width = kwargs.pop("width", 0.9)
+    width = width / len(metric_names) if no_overlap else width
+    xticks = (
+        np.arange(len(trial_names)) + width / 2
+        if no_overlap
+        else np.arange(len(trial_names))
+    )
+
+    # the KDE options of Axes.violinplot are applied here, the rest go to Axes.violin
+    violinplot_kwargs = dict(kwargs.pop("violinplot_kwargs", {}))
+    kde = _kde_method(
+        violinplot_kwargs.pop("bw_method", kwargs.pop("bw_method", "scott"))
+    )
+    points = violinplot_kwargs.pop("points", 100)
+    quantiles = violinplot_kwargs.pop("quantiles", None)
+    kwargs["violinplot_kwargs"] = violinplot_kwargs
+
+    series = []
+    for i, metric_name in enumerate(metric_names):
+        vpstats = cbook.violin_stats(
+            [np.asarray(v, dtype=float) for v in plot_metrics[metric_name].values()],
+            kde,
+            points=points,
+            quantiles=quantiles,
+        )
+        series.append(
+            {
+                "label": metric_name,
+                # the colors Axes.violinplot takes from the property cycle
+                "color": to_hex("C{}".format(i % 10)),
+                "positions": _floats(xticks + i * width if no_overlap else xticks),
+                "width": width * 0.9,
+                "vpstats": [
+                    {
+                        key: _floats(value) if np.ndim(value) else float(value)
+                        for key, value in stats.items()
+                    }
+                    for stats in vpstats
+                ],
+            }
+        )
+    default_xticks = (
+        xticks + (len(metric_names) - 1) * width / 2 if no_overlap else xticks
+    )
+    return series, default_xticks, trial_names
+
+
+def _build_scatter(plot_metrics, kwargs):
+    metric_names, trial_names = _layout(plot_metrics)
+    no_overlap = kwargs.pop("no_overlap", True)
+    width = 0.8 / len(metric_names)
+    xticks = np.arange(len(trial_names)) + 0.4
+    colors = matplotlib.colormaps["jet"](np.linspace(0, 1, len(metric_names)))
+    if kwargs.get("xtick_labels"):
+        kwargs.setdefault("xticklabels", kwargs.pop("xtick_labels"))
+
+    series = []
+    for i, metric_name in enumerate(metric_names):
+        cells = list(plot_metrics[metric_name].values())
+        series.append(
+            {
+                "label": metric_name,
+                "color": to_hex(colors[i]),
+                "x": _floats(np.repeat(xticks + i * width, [len(c) for c in cells])),
+                "y": _floats([value for cell in cells for value in cell]),
+            }
+        )
+    default_xticks = (
+        xticks + (len(metric_names) - 1) * width / 2 if no_overlap else xticks
+    )
+    return series, default_xticks, trial_names
+
+
+def _build_trajectory(plot_metrics, kwargs):
+    metric_names, trial_names = _layout(plot_metrics)
+    rng = random.Random(kwargs.pop("seed", 0))
+    palette = {
+        "markers": list(kwargs.pop("markers", None) or []),
+        "colors": list(kwargs.pop("colors", None) or []),
+    }
+    kwargs.pop("hatches", None)
+    choices = {key: values[:] for key, values in palette.items()}
+
+    def _choose(key):
+        if not choices[key]:
+            choices[key] = palette[key][:]
+        choice = rng.choice(choices[key])
+        choices[key].remove(choice)
+        return choice
+
+    series = []
+    for metric_name in metric_names:
+        cells = list(plot_metrics[metric_name].values())
+        x = np.arange(len(cells))
+        series.append(
+            {
+                "label": metric_name,
+                "marker": _choose("markers"),
+                "color": _choose("colors"),
+                "x": _floats(x),
+                "mean": _floats(compute_stat("average", cells, "central")),
+                "std": _floats(compute_stat("std", cells, "dispersion")),
+                "points_x": _floats(np.repeat(x, [len(c) for c in cells])),
+                "points_y": _floats([value for cell in cells for value in cell]),
+            }
+        )
+    trial_names = list(plot_metrics[metric_names[-1]].keys())
+    return series, np.arange(len(trial_names)), trial_names
+
+
+def _build_bar(plot_metrics, kwargs):
+    metric_names, _ = _layout(plot_metrics)
+    rng = random.Random(kwargs.pop("seed", 0))
+    palette = list(kwargs.pop("colors", None) or [])
+    colors = palette[:]
+    hatches = list(kwargs.pop("hatches", None) or [])
+    kwargs.pop("markers", None)
+    # the central value of each bar, see metric_visualizer.stat_registry
+    method = kwargs.pop("method", "average")
+    total_width = 0.9
+    width = total_width / len(metric_names)
+
+    series = []
+    for i, metric_name in enumerate(metric_names):
+        cells = list(plot_metrics[metric_name].values())
+        if not colors:
+            colors = palette[:]
+        color = rng.choice(colors)
+        colors.remove(color)
+        series.append(
+            {
+                "label": metric_name,
+                "color": color,
+                "hatch": rng.choice(hatches),
+                "x": _floats(
+                    np.arange(len(cells)) - (total_width - width) / 2 + i * width
+                ),
+                "heights": _floats(compute_stat(method, cells, "central")),
+                "width": width,
+            }
+        )
+    trial_names = list(plot_metrics[metric_names[-1]].keys())
+    return series, np.arange(len(trial_names)), trial_names
+
+
+_BUILDERS = {
+    "box": _build_box,
+    "violin": _build_violin,
+    "scatter": _build_scatter,
+    "trajectory": _build_trajectory,
+    "bar": _build_bar,
+}
+
+
+def build_plot_spec(plot_metrics, kind, by="trial", **kwargs):
+    """Compute the statistics and the layout of a plot, without drawing anything.
+
+    :param plot_metrics: the {series: {x tick: values}} data, such as MetricVisualizer.metrics
+        or its transpose()
+    :param kind: the kind of plot, one of SPEC_KINDS
+    :param by: the grouping of the x-axis, such as trial, metric, etc.
+    :param kwargs: the keyword arguments of the plot method of the kind, such as widths,
+        no_overlap, xticks, xticklabels, xlabel, ylabel, boxplot_kwargs, method, colors, etc.
+        The random markers, colors and hatches of trajectory and bar plots are drawn
+        with the seed kwarg (0 by default), so the same data always gives the same spec.
+
+    :return: a PlotSpec
+    """
+    if kind not in _BUILDERS:
+        raise NotImplementedError(
+            "Plot spec of kind {} not implemented, choose from {}".format(
+                kind, SPEC_KINDS
+            )
+        )
+    kwargs = dict(kwargs)
+    series, default_xticks, xticklabels = _BUILDERS[kind](plot_metrics, kwargs)
+    xticks = kwargs.pop("xticks", None)
+    if xticks is None:
+        xticks = default_xticks
+    return PlotSpec(
+        kind=kind,
+        series=series,
+        xticks=_floats(xticks),
+        xticklabels=[
+            str(label) for label in kwargs.pop("xticklabels", None) or xticklabels
+        ],
+        xlabel=kwargs.pop("xlabel", "Trial Name"),
+        ylabel=kwargs.pop("ylabel", "Metric Value"),
+        by=by,
+        options=kwargs,
+    )
+
+
+def _draw_box(spec, ax):
+    handles = []
+    for series in spec.series:
+        props = dict(linewidth=2, color=series["color"])
+        parts = ax.bxp(
+            series["stats"],
+            positions=series["positions"],
+            widths=series["width"],
+            boxprops=props,
+            capprops=props,
+            whiskerprops=props,
+            flierprops=dict(props, markeredgecolor=series["color"]),
+            medianprops=props,
+            **spec.options.get("boxplot_kwargs", {}),
+        )
+        handles.append(parts["boxes"][0])
+    return handles
+
+
+def _draw_violin(spec, ax):
+    handles = []
+    for series in spec.series:
+        parts = ax.violin(
+            [
+                dict(
+                    stats,
+                    coords=np.asarray(stats["coords"]),
+                    vals=np.asarray(stats["vals"]),
+                )
+                for stats in series["vpstats"]
+            ],
+            positions=series["positions"],
+            widths=series["width"],
+            showmeans=spec.options.get("showmeans", False),
+            showmedians=spec.options.get("showmedians", True),
+            showextrema=spec.options.get("showextrema", True),
+            **spec.options.get("violinplot_kwargs", {}),
+        )
+        for body in parts["bodies"]:
+            body.set_facecolor(series["color"])
+            body.set_edgecolor(series["color"])
+            body.set_linewidth(spec.options.get("linewidth", 3))
+        for key in ["cmeans", "cmins", "cmaxes", "cbars", "cmedians", "cquantiles"]:
+            if key in parts:
+                parts[key].set_color(series["color"])
+        handles.append(parts["bodies"][0])
+    return handles
+
+
+def _draw_scatter(spec, ax):
+    return [
+        ax.scatter(
+            series["x"],
+            series["y"],
+            color=series["color"],
+            **spec.options.get("scatter_kwargs", {}),
+        )
+        for series in spec.series
+    ]
+
+
+def _draw_trajectory(spec, ax):
+    handles = []
+    for series in spec.series:
+        handle = None
+        if spec.options.get("avg_point", True):
+            handle = ax.plot(
+                series["x"],
+                series["mean"],
+                marker=series["marker"],
+                color=series["color"],
+                markersize=spec.options.get("markersize", 3),
+                linewidth=spec.options.get("linewidth", 3),
+            )[0]
+        if spec.options.get("traj_fill", True):
+            mean, std = np.asarray(series["mean"]), np.asarray(series["std"])
+            fill = ax.fill_between(
+                series["x"],
+                mean - std,
+                mean + std,
+                color=series["color"],
+                alpha=spec.options.get("alpha", 0.2),
+            )
+            handle = handle or fill
+        if spec.options.get("traj_point", True):
+            points = ax.scatter(
+                series["points_x"],
+                series["points_y"],
+                marker=series["marker"],
+                color=series["color"],
+            )
+            handle = handle or points
+        handles.append(handle)
+    return handles
+
+
+def _draw_bar(spec, ax):
+    handles = []
+    for series in spec.series:
+        bars = ax.bar(
+            series["x"],
+            series["heights"],
+            width=series["width"],
+            hatch=series["hatch"],
+            color=series["color"],
+        )
+        handles.append(bars[0])
+        offset = max(series["heights"]) // 100
+        for x, height in zip(series["x"], series["heights"]):
+            ax.text(x, height + offset, "%.1f" % height, ha="center", va="bottom")
+    return handles
+
+
+_DRAWERS = {
+    "box": _draw_box,
+    "violin": _draw_violin,
+    "scatter": _draw_scatter,
+    "trajectory": _draw_trajectory,
+    "bar": _draw_bar,
+}
+
+
+def draw_plot_spec(spec, ax):
+    """Draw a PlotSpec on a matplotlib Axes, no statistic is computed here.
+
+    :param spec: the PlotSpec
+    :param ax: the matplotlib Axes to draw on
+
+    :return: the legend handles, one per series
+    """
+    options = spec.options
+    handles = _DRAWERS[spec.kind](spec, ax)
+
+    if options.get("legend", True):
+        ax.legend(
+            handles,
+            [series["label"] for series in spec.series],
+            loc=options.get("legend_loc", 1),
+        )
+
+    if options.get("minor_ticks", True):
+        ax.minorticks_on()
+
+    if options.get("grid", True):
+        ax.grid(which="major", linestyle="-", linewidth="0.3", color="grey")
+        ax.grid(which="minor", linestyle=":", linewidth="0.3", color="grey")
+
+    ax.set_xticks(
+        spec.xticks,
+        spec.xticklabels,
+        rotation=options.get("xrotation", 0),
+        horizontalalignment=options.get("horizontalalignment", "center"),
+        **options.get("xticks_kwargs", {}),
+    )
+    setp(
+        ax.get_yticklabels(),
+        rotation=options.get("yrotation", 0),
+        horizontalalignment="right",
+        verticalalignment=options.get("verticalalignment", "center"),
+        **options.get("yticks_kwargs", {}),
+    )
+
+    ax.set_xlabel(spec.xlabel)
+    ax.set_ylabel(spec.ylabel)
+    return handles
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+# file: stat_registry.py
+# time: 14:05 2026/10/19
+# author: yangheng <hy345@exeter.ac.uk>
+# github: https://github.com/yangheng95
+# huggingface: https://huggingface.co/yangheng
+# google scholar: https://scholar.google.com/citations?user=NPq5a_0AAAAJ&hl=en
+# Copyright (C) 2021. All Rights Reserved.
+import warnings
+from collections import OrderedDict
+
+import numpy as np
+
+from metric_visualizer.utils import (
+    ReservoirMetricList,
+    bootstrap_ci,
+    segmented_percentile,
+)
+
+# name -> (func, exact attribute of sampled cells)
+CENTRAL_STATS = OrderedDict()
+DISPERSION_STATS = OrderedDict()
+
+
+def register_stat(name, func, kind="dispersion", exact=None):
+    """Register a statistic for the summary tables, exports and plot annotations.
+
+    :param name: the name passed as method= (central) or stat= (dispersion)
+    :param func: func(segments, **kwargs) reducing the Segments of many cells to a
+        (cells,) array, or a (cells, k) array for intervals
+    :param kind: "central" or "dispersion"
+    :param exact: the attribute holding the exact (or sketched) value on sampled cells
+        (see ReservoirMetricList), such as avg, std, min, max, median
+    """
+    assert kind in ["central", "dispersion"]
+    registry = CENTRAL_STATS if kind == "central" else DISPERSION_STATS
+    registry[name] = (func, exact)
+
+
+class Segments:
+    """The values of many cells concatenated into one flat array, with the length of each cell.
+
+    The statistics reduce each segment of the flat array, so the memory is that of the
+    values themselves, however unequal the lengths of the cells are.
+    """
+
+    def __init__(self, values, lengths):
+        self.values = np.asarray(values, dtype=float)
+        self.lengths = np.asarray(lengths, dtype=int)
+        # the segment of each value, and the first value of each segment
+        self.ids = np.repeat(np.arange(len(self.lengths)), self.lengths)
+        self.starts = np.concatenate([[0], np.cumsum(self.lengths)[:-1]]).astype(int)
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def split(self):
+        """The values of each segment."""
+        return np.split(self.values, self.starts[1:])
+
+    def sum(self, values=None):
+        """The sums of the non-NaN values of each segment."""
+        values = self.values if values is None else values
+        return np.bincount(
+            self.ids, weights=np.where(np.isnan(values), 0, values), minlength=len(self)
+        )
+
+    def count(self):
+        """The numbers of non-NaN values of each segment."""
+        return np.bincount(
+            self.ids, weights=~np.isnan(self.values), minlength=len(self)
+        )
+
+    def mean(self, values=None):
+        """The means of the non-NaN values of each segment, NaN for segments without any."""
+        return self.sum(values) / self.count()
+
+    def reduce(self, ufunc, values=None):
+        """ufunc.reduceat over the non-empty segments, NaN for the empty ones."""
+        values = self.values if values is None else values
+        result = np.full(len(self), np.nan)
+        filled = self.lengths > 0
+        if filled.any():
+            result[filled] = ufunc.reduceat(values, self.starts[filled])
+        return result
+
+    def percentile(self, q, values=None):
+        """See segmented_percentile, a (len(q), cells) array or (cells,) for a scalar q."""
+        values = self.values if values is None else values
+        return segmented_percentile(values, self.lengths, q)
+
+
+def cell_segments(cells):
+    """Concatenate the values of many cells into Segments."""
+    lengths = [len(cell) for cell in cells]
+    if not sum(lengths):
+        return Segments(np.empty(0), lengths)
+    return Segments(
+        np.concatenate([np.asarray(cell.data, dtype=float) for cell in cells]),
+        lengths,
+    )
+
+
+def compute_stat(name, cells, kind="central", segments=None, **kwargs):
+    """Compute a registered statistic for many cells at once.
+
+    :param name: the name of the statistic
+    :param cells: the MetricList cells
+    :param kind: "central" or "dispersion"
+    :param segments: the cell_segments of the cells, if already built
+    :param kwargs: passed to the statistic
+
+    :return: a (cells,) or (cells, k) array
+    """
+    registry = CENTRAL_STATS if kind == "central" else DISPERSION_STATS
+    if name not in registry:
+        raise NotImplementedError(
+            "{} {} not implemented".format(
+                "method" if kind == "central" else "stat", name
+            )
+        )
+    func, exact = registry[name]
+    if segments is None:
+        segments = cell_segments(cells)
+    with warnings.catch_warnings(), np.errstate(all="ignore"):
+        warnings.simplefilter("ignore", RuntimeWarning)
+        result = np.array(func(segments, **kwargs), dtype=float)
+    if exact:
+        for i, cell in enumerate(cells):
+            if isinstance(cell, ReservoirMetricList):
+                result[i] = getattr(cell, exact)
+    return result
+
+
+def format_stat(center, dispersion, use_round=None):
+    """Format one table cell as "center (dispersion)" or "center [low, high]"."""
+
+    def _round(x):
+        return round(x, use_round) if use_round else x
+
+    if np.ndim(dispersion):
+        return "{} [{}]".format(
+            _round(center), ", ".join(str(_round(x)) for x in dispersion)
+        )
+    return "{} ({})".format(_round(center), _round(dispersion))
+
+
+def _extreme(segments, ufunc, fill):
+    # NaNs are skipped, segments of NaNs only give NaN
+    result = segments.reduce(
+        ufunc, np.where(np.isnan(segments.values), fill, segments.values)
+    )
+    return np.where(np.isinf(result) & (result == fill), np.nan, result)
+
+
+def _std(segments, **kwargs):
+    deviations = segments.values - segments.mean()[segments.ids]
+    return np.sqrt(segments.mean(deviations**2))
+
+
+def _trimmed_mean(segments, trim=0.1, **kwargs):
+    order = np.lexsort((segments.values, segments.ids))  # NaNs sort last
+    ordered = segments.values[order]
+    rank = np.arange(len(ordered)) - segments.starts[segments.ids]
+    n = segments.count().astype(int)
+    cut = np.floor(n * trim).astype(int)
+    keep = (rank >= cut[segments.ids]) & (rank < (n - cut)[segments.ids])
+    kept = np.where(keep, ordered, np.nan)
+    return segments.sum(kept) / np.bincount(
+        segments.ids, weights=keep, minlength=len(segments)
+    )
+
+
+def _moment_ratio(segments, order):
+    deviations = segments.values - segments.mean()[segments.ids]
+    m2 = segments.mean(deviations**2)
+    return segments.mean(deviations**order) / m2 ** (order / 2)
+
+
+def _mad(segments, **kwargs):
+    median = segments.percentile(50)
+    return segments.percentile(50, np.abs(segments.values - median[segments.ids]))
+
+
+def _ci(segments, method="average", **kwargs):
+    func, _ = CENTRAL_STATS[method]
+    return [
+        bootstrap_ci(
+            values[~np.isnan(values)],
+            statistic=lambda resamples: func(
+                Segments(resamples.ravel(), [resamples.shape[1]] * len(resamples)),
+                **kwargs,
+            ),
+            confidence=kwargs.get("ci_confidence", 0.95),
+            n_boot=kwargs.get("ci_n_boot", 1000),
+            chunk_size=kwargs.get("ci_chunk_size", None),
+            seed=kwargs.get("ci_seed", 0),
+            tol=kwargs.get("ci_tol", None),
+        )
+        for values in segments.split()
+    ]
+
+
+register_stat("average", lambda s, **kw: s.mean(), "central", "avg")
+register_stat("median", lambda s, **kw: s.percentile(50), "central", "median")
+register_stat("min", lambda s, **kw: _extreme(s, np.minimum, np.inf), "central", "min")
+register_stat("max", lambda s, **kw: _extreme(s, np.maximum, -np.inf), "central", "max")
+register_stat("trimmed_mean", _trimmed_mean, "central")
+
+register_stat("std", _std, "dispersion", "std")
+register_stat("iqr", lambda s, **kw: np.subtract(*s.percentile([75, 25])), exact="iqr")
+register_stat("skewness", lambda s, **kw: _moment_ratio(s, 3))
+register_stat("kurtosis", lambda s, **kw: _moment_ratio(s, 4) - 3)
+register_stat("mad", _mad)
+register_stat(
+    "percentile",
+    lambda s, percentiles=(5, 95), **kw: s.percentile(percentiles).T,
+)
+register_stat("ci", _ci)
@@ -6,13 +6,25 @@
 # huggingface: https://huggingface.co/yangheng
 # google scholar: https://scholar.google.com/citations?user=NPq5a_0AAAAJ&hl=en
 # Copyright (C) 2021. All Rights Reserved.
+import random
+import re
+
 import numpy as np
 from scipy import stats
 
+try:
+    # the display width of wide characters, as tabulate measures it
+    from wcwidth import wcswidth as _wcswidth
+except ImportError:
+    _wcswidth = None
+
 
 class MetricList:
     def __init__(self, *args, **kwargs):
         self.data = list(*args, **kwargs)
+        # bumped by every change, edits only by the ones other than append/extend
+        self.version = 0
+        self.edits = 0
         try:
             self.avg = np.nanmean(self.data)
             self.std = np.nanstd(self.data)
@@ -33,7 +45,10 @@ class MetricList:
         except Exception as e:
             print("Can not create MetricList with: ", self.data)
 
-    def _update(self):
+    def _update(self, appended=False):
+        self.version = getattr(self, "version", 0) + 1
+        if not appended:
+            self.edits = getattr(self, "edits", 0) + 1
         self.avg = np.nanmean(self.data)
         self.std = np.nanstd(self.data)
         self.median = np.nanmedian(self.data)
@@ -71,13 +86,13 @@ class MetricList:
 
     def append(self, item):
         self.data.append(item)
-        self._update()
+        self._update(appended=True)
 
     def extend(self, iterable):
         if isinstance(iterable, MetricList):
             iterable = iterable.data.copy()
         self.data.extend(list(iterable))
-        self._update()
+        self._update(appended=True)
 
     def insert(self, index, item):
         self.data.insert(index, item)
@@ -111,3 +126,633 @@ class MetricList:
 
     def copy(self):
         return self.data.copy()
+
+    def _extent(self):
+        """The number, minimum and maximum of the finite values."""
+        data = np.asarray(self.data, dtype=float)
+        data = data[np.isfinite(data)]
+        if not len(data):
+            return 0, np.nan, np.nan
+        return len(data), data.min(), data.max()
+
+    def quantiles(self, q):
+        """The q-th percentiles of the values (linear interpolation), cached until the values change."""
+        q = [float(p) for p in np.atleast_1d(q)]
+        version, cached = getattr(self, "_quantiles", (None, None))
+        if version != self.version:
+            cached = {}
+            self._quantiles = (self.version, cached)
+        missing = [p for p in q if p not in cached]
+        if missing:
+            data = np.asarray(self.data, dtype=float)
+            data = data[np.isfinite(data)]
+            if len(data):
+                cached.update(zip(missing, np.percentile(data, missing).tolist()))
+            else:
+                cached.update((p, np.nan) for p in missing)
+        return np.array([cached[p] for p in q])
+
+    def box_stats(self, whis=1.5, max_fliers=100, bootstrap=None, autorange=False):
+        """
+        The statistics of a box of the values, as drawn by matplotlib's Axes.bxp, computed
+        once until the values change. The whiskers reach the most extreme values within
+        whis * IQR of the box, or the whis percentiles if whis is a pair. The fliers are
+        the values beyond, at most max_fliers of them evenly spread from the lowest to the
+        highest. The arguments are the same as in Axes.boxplot.
+
+        :return: a dict of med, q1, q3, whislo, whishi, fliers, mean, iqr, cilo and cihi
+        """
+        key = (self.version, repr(whis), max_fliers, bootstrap, autorange)
+        cached = getattr(self, "_box_stats", None)
+        if cached is None or cached[0] != key:
+            cached = (
+                key,
+                self._compute_box_stats(whis, max_fliers, bootstrap, autorange),
+            )
+            self._box_stats = cached
+        return cached[1]
+
+    def _compute_box_stats(self, whis, max_fliers, bootstrap, autorange):
+        n, low, high = self._extent()
+        stats = dict.fromkeys(
+            ["med", "q1", "q3", "whislo", "whishi", "mean", "iqr", "cilo", "cihi"],
+            np.nan,
+        )
+        stats["fliers"] = []
+        if not n:
+            return stats
+
+        q1, med, q3 = self.quantiles([25, 50, 75])
+        iqr = q3 - q1
+        if np.iterable(whis):
+            fence_low, fence_high = self.quantiles(whis)
+        elif autorange and iqr == 0:
+            fence_low, fence_high = low, high
+        else:
+            fence_low, fence_high = q1 - whis * iqr, q3 + whis * iqr
+
+        # low and high are exact, the values in between may only be a sample,
+        # or none at all: then the whiskers end at the fences
+        data = np.asarray(self.data, dtype=float)
+        data = data[np.isfinite(data)]
+        inside = data[(data >= fence_low) & (data <= fence_high)]
+        if low >= fence_low:
+            whislo = low
+        elif len(inside):
+            whislo = inside.min()
+        else:
+            whislo = q1 if len(data) else fence_low
+        if high <= fence_high:
+            whishi = high
+        elif len(inside):
+            whishi = inside.max()
+        else:
+            whishi = q3 if len(data) else fence_high
+
+        fliers = np.unique(
+            np.concatenate(
+                [
+                    data[(data < fence_low) | (data > fence_high)],
+                    [x for x in (low, high) if x < fence_low or x > fence_high],
+                ]
+            )
+        )
+        if max_fliers is not None and len(fliers) > max_fliers:
+            fliers = fliers[
+                np.linspace(0, len(fliers) - 1, max_fliers).round().astype(int)
+            ]
+
+        if bootstrap and len(data):
+            cilo, cihi = bootstrap_ci(data, "median", n_boot=bootstrap)
+        else:
+            cilo, cihi = med - 1.57 * iqr / np.sqrt(n), med + 1.57 * iqr / np.sqrt(n)
+
+        stats.update(
+            med=med,
+            q1=q1,
+            q3=q3,
+            whislo=min(whislo, q1),
+            whishi=max(whishi, q3),
+            fliers=fliers.tolist(),
+            mean=self.avg,
+            iqr=iqr,
+            cilo=cilo,
+            cihi=cihi,
+        )
+        return stats
+
+
+def segmented_percentile(values, lengths, q):
+    """Percentiles of consecutive segments of a flat array in one pass.
+
+    Interpolates linearly like np.percentile, ignores NaNs and gives NaN for
+    segments without values.
+
+    :param values: the values of all segments, concatenated
+    :param lengths: the length of each segment
+    :param q: a percentile or a sequence of percentiles, in [0, 100]
+
+    :return: an array of shape (len(q), len(lengths)), or (len(lengths),) for a scalar q
+    """
+    values = np.asarray(values, dtype=float)
+    lengths = np.asarray(lengths, dtype=int)
+    segments = np.repeat(np.arange(len(lengths)), lengths)
+    ordered = values[np.lexsort((values, segments))]  # NaNs sort last
+    starts = np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(int)
+    valid = np.bincount(
+        segments, weights=~np.isnan(values), minlength=len(lengths)
+    ).astype(int)
+
+    pos = np.atleast_1d(q)[:, None] / 100 * np.maximum(valid - 1, 0)[None, :]
+    lo = np.floor(pos).astype(int)
+    hi = np.minimum(lo + 1, np.maximum(valid - 1, 0))
+    last = max(len(ordered) - 1, 0)
+    lo_values = ordered[np.minimum(starts + lo, last)] if len(ordered) else pos * np.nan
+    hi_values = ordered[np.minimum(starts + hi, last)] if len(ordered) else pos * np.nan
+    result = lo_values + (hi_values - lo_values) * (pos - lo)
+    result[:, valid == 0] = np.nan
+    return result if np.ndim(q) else result[0]
+
+
+def bootstrap_ci(
+    data,
+    statistic="average",
+    confidence=0.95,
+    n_boot=1000,
+    chunk_size=None,
+    seed=0,
+    tol=None,
+):
+    """Percentile bootstrap confidence interval of a statistic.
+
+    The resamples are drawn as (chunk_size, n) index matrices from a seeded
+    Generator and reduced along axis 1, so no Python loop runs per resample.
+
+    :param data: the values, NaNs are ignored
+    :param statistic: average (or mean), median, min or max, or a callable reducing
+        a (resamples, n) matrix to one estimate per row
+    :param confidence: the confidence level of the interval
+    :param n_boot: the number of resamples
+    :param chunk_size: the number of resamples drawn at once, bounds the memory to chunk_size * n values
+    :param seed: the seed of the resamples
+    :param tol: stop early once both endpoints move less than tol times the interval width between chunks
+
+    :return: a (low, high) tuple
+    """
+    reducers = {
+        "average": np.mean,
+        "mean": np.mean,
+        "median": np.median,
+        "min": np.min,
+        "max": np.max,
+    }
+    if callable(statistic):
+        reducer = statistic
+    elif statistic in reducers:
+        reducer = lambda resamples: reducers[statistic](resamples, axis=1)
+    else:
+        raise NotImplementedError("statistic {} not implemented".format(statistic))
+    values = np.asarray(data, dtype=float)
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return np.nan, np.nan
+
+    if not chunk_size:
+        chunk_size = 2**20 // len(values)
+        if tol is not None:
+            chunk_size = min(chunk_size, n_boot // 10)
+    chunk_size = max(1, min(chunk_size, n_boot))
+    q = [(1 - confidence) / 2 * 100, (1 + confidence) / 2 * 100]
+
+    rng = np.random.default_rng(seed)
+    estimates = np.empty(n_boot)
+    done = 0
+    bounds = None
+    while done < n_boot:
+        rows = min(chunk_size, n_boot - done)
+        idx = rng.integers(0, len(values), size=(rows, len(values)))
+        estimates[done : done + rows] = reducer(values[idx])
+        done += rows
+        if tol is not None and done < n_boot:
+            new_bounds = np.percentile(estimates[:done], q)
+            if bounds is not None and np.all(
+                np.abs(new_bounds - bounds) <= tol * (new_bounds[1] - new_bounds[0])
+            ):
+                break
+            bounds = new_bounds
+    low, high = np.percentile(estimates[:done], q)
+    return low, high
+
+
+class RunningStats:
+    """Exact streaming count/mean/variance/min/max (Welford), O(1) per value."""
+
+    def __init__(self, values=()):
+        self.seen = 0
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.sum = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        for value in values:
+            self.push(value)
+
+    def push(self, value):
+        self.seen += 1
+        if value is None or np.isnan(value):
+            return
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    @property
+    def var(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else np.nan
+
+    @property
+    def std(self):
+        return np.sqrt(self.var)
+
+    def confidence_sequence(self, alpha=0.05, rho=10):
+        """Anytime-valid confidence sequence of the mean.
+
+        Uses the two-sided normal-mixture boundary of Howard et al. (2021) with a
+        plug-in variance, so the interval may be checked after every value
+        without inflating the error rate.
+
+        :param alpha: the error rate over all the checks
+        :param rho: the number of values the boundary is tightest around
+
+        :return: a (low, high) tuple, infinite with fewer than 2 values
+        """
+        if self.count < 2:
+            return -np.inf, np.inf
+        t = self.count
+        radius = (
+            self.std / t * np.sqrt((t + rho) * np.log((t + rho) / (rho * alpha**2)))
+        )
+        return self.mean - radius, self.mean + radius
+
+
+class P2Quantile:
+    """Streaming estimate of one quantile in O(1) memory and time per value
+    (the P-square algorithm of Jain and Chlamtac, 1985)."""
+
+    def __init__(self, p):
+        self.p = p
+        self.count = 0
+        self.heights = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self.increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def push(self, value):
+        self.count += 1
+        q, n = self.heights, self.positions
+        if self.count <= 5:
+            q.append(value)
+            q.sort()
+            return
+
+        if value < q[0]:
+            q[0] = value
+            k = 0
+        elif value >= q[4]:
+            q[4] = value
+            k = 3
+        else:
+            k = next(i for i in range(4) if q[i] <= value < q[i + 1])
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        for i in range(1, 4):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                height = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+                )
+                if not q[i - 1] < height < q[i + 1]:
+                    height = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = height
+                n[i] += d
+
+    @property
+    def value(self):
+        if not self.heights:
+            return np.nan
+        if self.count <= 5:
+            return np.percentile(self.heights, self.p * 100)
+        return self.heights[2]
+
+
+class StreamingIQR:
+    """Streaming quartiles of a cell, used to screen values as they are logged."""
+
+    def __init__(self):
+        self.quartiles = [P2Quantile(0.25), P2Quantile(0.5), P2Quantile(0.75)]
+
+    @property
+    def count(self):
+        return self.quartiles[0].count
+
+    def push(self, value):
+        if value is None or np.isnan(value):
+            return
+        for quartile in self.quartiles:
+            quartile.push(value)
+
+    def bounds(self, outlier_constant=1.5):
+        q1, _, q3 = (quartile.value for quartile in self.quartiles)
+        return q1 - (q3 - q1) * outlier_constant, q3 + (q3 - q1) * outlier_constant
+
+    def is_outlier(self, value, outlier_constant=1.5):
+        low, high = self.bounds(outlier_constant)
+        return value < low or value > high
+
+
+class ReservoirMetricList(MetricList):
+    """A MetricList of constant memory for long-running metrics.
+
+    Only a sample of at most `size` values is kept in `data` (for the plots and
+    the median/iqr/skewness/kurtosis), while avg, std, var, min, max, sum and
+    count are exact over every appended value. The sample is a uniform
+    reservoir, or with stratified=True every stride-th value, the stride
+    doubling whenever the sample is full, so it stays evenly spread in time.
+    With sketch=True, the quartiles are sketched over every appended value
+    (see StreamingIQR), so the boxes of a cell keeping no sample (size=0) can
+    still be drawn.
+    """
+
+    def __init__(self, values=(), size=1000, stratified=False, seed=0, sketch=False):
+        self.data = []
+        self.version = 0
+        self.size = size
+        self.stratified = stratified
+        self.stride = 1
+        self.running = RunningStats()
+        self.sketch = StreamingIQR() if sketch else None
+        self._rng = random.Random(seed)
+        for value in values:
+            self.append(value)
+
+    def _update(self, appended=False):
+        self.version = getattr(self, "version", 0) + 1
+
+    def append(self, item):
+        self.version += 1
+        self.running.push(item)
+        if getattr(self, "sketch", None) is not None:
+            self.sketch.push(item)
+        seen = self.running.seen
+        if self.size == 0:
+            # aggregates only, no sample is kept
+            return
+        if self.stratified:
+            if (seen - 1) % self.stride == 0:
+                self.data.append(item)
+                if len(self.data) > self.size:
+                    self.data = self.data[::2]
+                    self.stride *= 2
+        elif len(self.data) < self.size:
+            self.data.append(item)
+        else:
+            j = self._rng.randrange(seen)
+            if j < self.size:
+                self.data[j] = item
+
+    def extend(self, iterable):
+        for item in iterable:
+            self.append(item)
+
+    def _unsupported(self, *args, **kwargs):
+        raise TypeError(
+            "A ReservoirMetricList only supports append, extend and clear, "
+            "its exact aggregates can not take values back out or in at a position"
+        )
+
+    __setitem__ = __delitem__ = insert = pop = remove = _unsupported
+
+    def clear(self):
+        self.version += 1
+        self.data.clear()
+        self.stride = 1
+        self.running = RunningStats()
+        if getattr(self, "sketch", None) is not None:
+            self.sketch = StreamingIQR()
+
+    @property
+    def count(self):
+        return self.running.count
+
+    @property
+    def avg(self):
+        return self.running.mean if self.running.count else np.nan
+
+    @property
+    def var(self):
+        return self.running.m2 / self.running.count if self.running.count else np.nan
+
+    @property
+    def std(self):
+        return np.sqrt(self.var)
+
+    @property
+    def min(self):
+        return self.running.min
+
+    @property
+    def max(self):
+        return self.running.max
+
+    @property
+    def sum(self):
+        return self.running.sum
+
+    def _extent(self):
+        return self.running.count, self.running.min, self.running.max
+
+    def quantiles(self, q):
+        """The q-th percentiles of the sample, the quartiles are sketched over all values with sketch=True."""
+        result = super().quantiles(q)
+        sketch = getattr(self, "sketch", None)
+        if sketch is not None and sketch.count:
+            for i, p in enumerate(np.atleast_1d(q)):
+                if p in (25, 50, 75):
+                    result[i] = sketch.quartiles[[25, 50, 75].index(p)].value
+        return result
+
+    @property
+    def median(self):
+        if getattr(self, "sketch", None) is not None:
+            return self.quantiles(50)[0]
+        return np.nanmedian(self.data)
+
+    @property
+    def iqr(self):
+        if getattr(self, "sketch", None) is not None:
+            q1, q3 = self.quantiles([25, 75])
+            return q3 - q1
+        return stats.iqr(self.data, nan_policy="omit")
+
+    @property
+    def skewness(self):
+        return stats.skew(self.data, keepdims=True, nan_policy="omit")
+
+    @property
+    def kurtosis(self):
+        return stats.kurtosis(self.data, keepdims=True, nan_policy="omit")
+
+
+# the column types of tabulate, from the least to the most generic
+_GRID_TYPES = [type(None), bool, int, float, bytes, str]
+# numbers with thousands separators, such as "1,000.5"
+_THOUSANDS = re.compile(
+    r"^(([+-]?[0-9]{1,3})(?:,([0-9]{3}))*)?(?(1)\.[0-9]*|\.[0-9]+)?$"
+)
+
+
+def _grid_type(value):
+    """The least generic type of a cell, deduced as tabulate does."""
+    if value is None or (isinstance(value, (str, bytes)) and not value):
+        return type(None)
+    if hasattr(value, "isoformat"):
+        return str
+    if type(value) is bool or (isinstance(value, str) and value in ("True", "False")):
+        return bool
+    if (
+        type(value) is int
+        or str(type(value)).startswith("<class 'numpy.int")
+        or (isinstance(value, (str, bytes)) and _convertible(int, value))
+        or (isinstance(value, str) and _THOUSANDS.match(value) and "." not in value)
+    ):
+        return int
+    if (
+        type(value) is float
+        or (
+            _convertible(float, value)
+            and (
+                not isinstance(value, (str, bytes))
+                or np.isfinite(float(value))
+                or value.lower() in ("inf", "-inf", "nan")
+            )
+        )
+        or (isinstance(value, str) and _THOUSANDS.match(value))
+    ):
+        return float
+    if isinstance(value, bytes):
+        return bytes
+    return str
+
+
+def _convertible(conv, value):
+    try:
+        conv(value)
+        return True
+    except (ValueError, TypeError):
+        return False
+
+
+def _grid_cell(value, column_type):
+    """Format a cell by the type of its column, as tabulate does with floatfmt="g"."""
+    if value is None or (isinstance(value, (str, bytes)) and not value):
+        return ""
+    if column_type is int:
+        return format(value, "")
+    if column_type is float:
+        if isinstance(value, str):
+            value = value.replace(",", "")
+        try:
+            return format(float(value), "g")
+        except (ValueError, TypeError):
+            return f"{value}"
+    if column_type is bytes:
+        try:
+            return str(value, "ascii")
+        except (TypeError, UnicodeDecodeError):
+            return str(value)
+    return f"{value}"
+
+
+def _text_width(text):
+    width = _wcswidth(text) if _wcswidth is not None else -1
+    return width if width >= 0 else len(text)
+
+
+def _pad(text, width, align):
+    fill = width - _text_width(text)
+    if align == "center":
+        return " " * (fill // 2) + text + " " * (fill - fill // 2)
+    return text + " " * fill
+
+
+def grid_lines(rows, header):
+    """Yield the lines of a table in the fancy_grid style of tabulate, row by row.
+
+    The output is that of tabulate(rows, headers=header, numalign="center",
+    tablefmt="fancy_grid"): the int and float columns are centered, the others
+    aligned left, and the floats formatted with "g". The column types and widths
+    are measured in passes over the rows before any line is yielded, so the table
+    is never formatted as a whole in memory.
+
+    :param rows: a sequence of rows, iterated three times
+    :param header: the column names
+    """
+    header = [str(name) for name in header]
+    types = [bool] * len(header)
+    multiline = any(re.search("[\r\n]", name) for name in header)
+    for row in rows:
+        multiline = multiline or any(re.search("[\r\n]", str(v)) for v in row)
+        types = [
+            _GRID_TYPES[max(_GRID_TYPES.index(t), _GRID_TYPES.index(_grid_type(v)))]
+            for t, v in zip(types, row)
+        ]
+    aligns = ["center" if t in (int, float) else "left" for t in types]
+
+    def _cells(row):
+        cells = [
+            _grid_cell(value, t).strip().splitlines() for value, t in zip(row, types)
+        ]
+        # like tabulate, an empty cell has no line at all in a multiline table
+        return cells if multiline else [cell or [""] for cell in cells]
+
+    widths = [
+        max(_text_width(line) for line in name.splitlines() or [""]) + 2
+        for name in header
+    ]
+    for row in rows:
+        widths = [
+            max([w] + [_text_width(line) for line in cell])
+            for w, cell in zip(widths, _cells(row))
+        ]
+
+    def _border(left, fill, sep, right):
+        return left + sep.join(fill * (w + 2) for w in widths) + right
+
+    def _lines(cells):
+        for i in range(max([0] + [len(cell) for cell in cells])):
+            yield (
+                "│ "
+                + " │ ".join(
+                    _pad(cell[i] if i < len(cell) else "", w, align)
+                    for cell, w, align in zip(cells, widths, aligns)
+                )
+                + " │"
+            )
+
+    yield _border("╒", "═", "╤", "╕")
+    yield from _lines([name.splitlines() or [""] for name in header])
+    yield _border("╞", "═", "╪", "╡")
+    for i, row in enumerate(rows):
+        if i:
+            yield _border("├", "─", "┼", "┤")
+        yield from _lines(_cells(row))
+    yield _border("╘", "═", "╧", "╛")